@@ -0,0 +1,230 @@
+import itertools
+import json
+import logging
+import platform
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import imagesize
+import numpy as np
+
+import create_separation_gt
+from utils.input_utils import get_file_paths, scan_image_names, scan_inventory_dirs, supported_image_formats
+from utils.rule_utils import DEFAULT_RULES_CONFIG, PageTable, SeparationRules
+from utils.synthetic_utils import generate_synthetic_archive
+from utils.xlsx_utils import XLSXSeparationWriter
+
+
+def get_arguments():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the separation ground truth pipeline on a synthetic archive")
+    io_args = parser.add_argument_group("IO")
+    io_args.add_argument("-o", "--output", help="Output json file, printed to stdout if not set", type=str)
+    io_args.add_argument("--tmp-dir", help="Dir to generate the synthetic archive and exports in", type=str)
+
+    archive_args = parser.add_argument_group("Archive")
+    archive_args.add_argument("--inventories", help="Number of inventory dirs", type=int, default=50)
+    archive_args.add_argument("--pages", help="Minimum and maximum pages per inventory", type=int, nargs=2, default=[50, 500])
+    archive_args.add_argument(
+        "--document-length", help="Minimum and maximum pages per document", type=int, nargs=2, default=[1, 40]
+    )
+    archive_args.add_argument(
+        "--sizes",
+        help="Paper sizes to pick from per document, as WIDTHxHEIGHT",
+        type=str,
+        nargs="+",
+        default=["2480x3508", "1748x2480", "2550x3300", "3508x2480"],
+    )
+    archive_args.add_argument("--deelopname-rate", help="Chance of a deelopname after a page", type=float, default=0.02)
+    archive_args.add_argument("--double-width-rate", help="Chance of a double width page", type=float, default=0.05)
+    archive_args.add_argument("--half-width-rate", help="Chance of a half width page", type=float, default=0.05)
+    archive_args.add_argument("--seed", help="Random seed", type=int, default=0)
+
+    parser.add_argument("--repeat", help="Number of times to time each stage", type=int, default=3)
+    parser.add_argument(
+        "--workers", help="Worker counts to compare for a full run of main", type=int, nargs="+", default=[1, 4, 16]
+    )
+    parser.add_argument(
+        "--probe-backends",
+        help="Probe backends to compare for a full run of main",
+        type=str,
+        nargs="+",
+        choices=["sync", "async"],
+        default=["sync", "async"],
+    )
+    parser.add_argument(
+        "--copy-mode",
+        help="Copy mode for the dirs export",
+        type=str,
+        choices=["copy", "link", "symlink", "reflink"],
+        default="link",
+    )
+    parser.add_argument("--copy-workers", help="Number of files to materialise in parallel", type=int, default=8)
+
+    args = parser.parse_args()
+    return args
+
+
+def time_stage(function, repeat: int) -> dict[str, float | list[float]]:
+    """
+    Time a function multiple times
+
+    Args:
+        function (Callable): function without arguments to time
+        repeat (int): number of times to run the function
+
+    Returns:
+        dict[str, float | list[float]]: all timings and the minimum, in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"seconds": min(timings), "all_seconds": timings}
+
+
+def main(args):
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+
+    sizes = [tuple(int(value) for value in size.split("x")) for size in args.sizes]
+
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        archive_dir = tmp_dir.joinpath("archive")
+
+        start = time.perf_counter()
+        total_files = generate_synthetic_archive(
+            archive_dir,
+            inventories=args.inventories,
+            pages_per_inventory=tuple(args.pages),
+            document_length=tuple(args.document_length),
+            sizes=sizes,
+            deelopname_rate=args.deelopname_rate,
+            double_width_rate=args.double_width_rate,
+            half_width_rate=args.half_width_rate,
+            seed=args.seed,
+        )
+        logger.info(f"Generated {total_files} files in {time.perf_counter() - start:.2f}s")
+
+        inventory_dirs = sorted(path for path in archive_dir.iterdir() if path.is_dir())
+
+        # Run every stage once outside the timer, so the later stages have their inputs
+        image_paths = {
+            inventory_dir.name: get_file_paths(inventory_dir, supported_image_formats, disable_check=True)
+            for inventory_dir in inventory_dirs
+        }
+        image_sizes = {
+            inventory_number: np.asarray([imagesize.get(path) for path in paths], dtype=np.int64)
+            for inventory_number, paths in image_paths.items()
+        }
+        image_names = {
+            inventory_number: [path.name for path in paths] for inventory_number, paths in image_paths.items()
+        }
+        rules = SeparationRules.from_config(DEFAULT_RULES_CONFIG)
+        separated_documents = {
+            inventory_number: create_separation_gt.separate_inventory(archive_dir.joinpath(inventory_number))
+            for inventory_number in image_paths
+        }
+
+        def listing():
+            for inventory_dir in inventory_dirs:
+                get_file_paths(inventory_dir, supported_image_formats, disable_check=True)
+
+        def listing_scandir():
+            for inventory_dir in scan_inventory_dirs(archive_dir):
+                scan_image_names(inventory_dir, supported_image_formats)
+
+        def probing():
+            for paths in image_paths.values():
+                for path in paths:
+                    imagesize.get(path)
+
+        def separation():
+            for inventory_number in image_paths:
+                rules.evaluate(PageTable(image_names[inventory_number], image_sizes[inventory_number]))
+
+        def xlsx_export():
+            writer = XLSXSeparationWriter(tmp_dir.joinpath("output.xlsx"))
+            for inventory_number, documents in separated_documents.items():
+                writer.add_inventory(inventory_number, documents)
+            writer.save()
+
+        copy_executor = ThreadPoolExecutor(max_workers=args.copy_workers)
+
+        def export_dirs(output_dir: Path):
+            for inventory_number, documents in separated_documents.items():
+                create_separation_gt.export_inventory_dirs(
+                    output_dir.joinpath(inventory_number), documents, copy_executor, args.copy_mode
+                )
+
+        def dirs_export():
+            export_dirs(tmp_dir.joinpath(f"output_{time.perf_counter_ns()}"))
+
+        # An unchanged re-export only has to check the existing tree
+        reexport_dir = tmp_dir.joinpath("output_reexport")
+        export_dirs(reexport_dir)
+
+        def dirs_reexport():
+            export_dirs(reexport_dir)
+
+        # listing times get_file_paths, listing_scandir scan_image_names, probing imagesize.get, separation
+        # SeparationRules.evaluate with DEFAULT_RULES_CONFIG, and the export stages the writers and export_inventory_dirs
+        stages = {
+            "listing": (listing, len(inventory_dirs)),
+            "listing_scandir": (listing_scandir, len(inventory_dirs)),
+            "probing": (probing, total_files),
+            "separation": (separation, total_files),
+            "xlsx_export": (xlsx_export, total_files),
+            "dirs_export": (dirs_export, total_files),
+            "dirs_reexport": (dirs_reexport, total_files),
+        }
+
+        results = {}
+        for name, (function, items) in stages.items():
+            results[name] = time_stage(function, args.repeat)
+            results[name]["items_per_second"] = items / results[name]["seconds"] if results[name]["seconds"] else None
+            logger.info(f"{name}: {results[name]['seconds']:.4f}s")
+        copy_executor.shutdown()
+
+        for probe_backend, workers in itertools.product(args.probe_backends, args.workers):
+            main_args = create_separation_gt.get_arguments(
+                ["-i", str(archive_dir), "-w", str(workers), "--probe-backend", probe_backend]
+            )
+            name = f"main_{probe_backend}_workers_{workers}"
+            # Silence the per inventory progress of main while timing full runs
+            logging.disable(logging.INFO)
+            try:
+                results[name] = time_stage(lambda: create_separation_gt.main(main_args), args.repeat)
+            finally:
+                logging.disable(logging.NOTSET)
+            results[name]["items_per_second"] = total_files / results[name]["seconds"] if results[name]["seconds"] else None
+            logger.info(f"{name}: {results[name]['seconds']:.4f}s")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "total_inventories": len(inventory_dirs),
+        "total_files": total_files,
+        "stages": results,
+    }
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with output_path.open(mode="w") as f:
+            json.dump(report, f, indent=4)
+        logger.info(f"Benchmark results saved to {output_path}")
+    else:
+        print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    main(args)
@@ -1,40 +1,158 @@
+import json
 import logging
-import re
+import os
+import sys
+import time
 from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
 from pathlib import Path
-
-import imagesize
-from openpyxl import Workbook
-
-from utils.copy_utils import copy_mode
-from utils.input_utils import get_file_paths, supported_image_formats
-
-
-def get_arguments():
+from typing import Any, Iterable, Iterator, Optional, TextIO
+
+import numpy as np
+
+from utils.cache_utils import ImageSizeCache
+from utils.csv_utils import CSVSeparationWriter
+from utils.input_utils import scan_image_names, scan_inventory_dirs, supported_image_formats
+from utils.journal_utils import Journal
+from utils.manifest_utils import (
+    Manifest,
+    deserialize_documents,
+    get_listing_hash,
+    get_names_hash,
+    serialize_documents,
+)
+from utils.materialise_utils import materialise_inventory, remove_tree
+from utils.page_index_utils import PageIndexWriter
+from utils.pipeline_utils import ordered_map
+from utils.probe_utils import AsyncImageSizeProber
+from utils.profile_utils import StageProfiler, profile_run, profile_stage
+from utils.rule_utils import DEFAULT_RULES_CONFIG, ContentRule, PageTable, SeparationRules
+from utils.separation_utils import SeparatedInventory
+from utils.shard_utils import in_shard, parse_shard
+from utils.thumbnail_utils import CONTENT_SIGNALS, DEFAULT_CONTENT_THRESHOLDS, ContentFeatureExtractor, ThumbnailCache
+from utils.xlsx_utils import XLSXSeparationWriter
+
+
+def get_arguments(argv=None):
     import argparse
 
     parser = argparse.ArgumentParser(description="Create separation ground truth")
     io_args = parser.add_argument_group("IO")
-    io_args.add_argument("-i", "--input", help="Train input folder/file", nargs="+", action="extend", type=str, required=True)
+    io_args.add_argument("-i", "--input", help="Train input folder/file", nargs="+", action="extend", type=str)
     io_args.add_argument("-o", "--output", help="Output folder", type=str)
+    io_args.add_argument(
+        "--page-index",
+        help="Also write a memory-mapped page index to look up the document and file of a page with query_page_index.py",
+        type=str,
+    )
+    io_args.add_argument(
+        "--serve",
+        help="Instead of --input, read inventory dirs from stdin, one per line, and write a json line per inventory number to stdout until stdin is closed",
+        action="store_true",
+    )
 
     parser.add_argument(
         "-m",
         "--output-mode",
         help="Output mode",
         type=str,
-        choices=["xlsx", "dirs"],
+        choices=["xlsx", "dirs", "csv"],
         default="xlsx",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of inventory numbers to process in parallel",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--shard",
+        help="Only process shard i of N (zero based, as i/N), write the partial results with --output-mode csv and combine them with merge_separation_gt.py",
+        type=parse_shard,
+    )
+
+    probe_args = parser.add_argument_group("Probe")
+    probe_args.add_argument(
+        "--probe-backend",
+        help="Read the image sizes one at a time per inventory (sync) or many at once from a shared event loop (async)",
+        type=str,
+        choices=["sync", "async"],
+        default="sync",
+    )
+    probe_args.add_argument(
+        "--probe-concurrency", help="Maximum number of image size reads in flight for the async backend", type=int, default=64
+    )
+
+    copy_args = parser.add_argument_group("Copy")
+    copy_args.add_argument(
+        "--copy-mode",
+        help="How to materialise the scans for the dirs output mode",
+        type=str,
+        choices=["copy", "link", "symlink", "reflink"],
+        default="copy",
+    )
+    copy_args.add_argument("--copy-workers", help="Number of files to materialise in parallel", type=int, default=8)
+
+    parser.add_argument(
+        "--rules",
+        help="Json config with the separation rules, defaults to the deelopname pattern and a size margin of 0.1",
+        type=str,
+    )
+
+    content_args = parser.add_argument_group("Content")
+    content_args.add_argument(
+        "--content-signal",
+        help="Also start a document when the content of a scan differs from the previous one, based on a thumbnail",
+        type=str,
+        choices=CONTENT_SIGNALS,
+    )
+    content_args.add_argument(
+        "--content-threshold",
+        help=f"Content distance in [0, 1] above which a scan starts a document, if the rules have no content rule. Defaults to {DEFAULT_CONTENT_THRESHOLDS}",
+        type=float,
+    )
+    content_args.add_argument(
+        "--content-processes", help="Number of processes decoding thumbnails. Defaults to the number of CPUs", type=int
+    )
+    content_args.add_argument("--thumbnail-cache", help="SQLite file to cache the content features in between runs", type=str)
+
+    cache_args = parser.add_argument_group("Cache")
+    cache_args.add_argument("--size-cache", help="SQLite file to cache image sizes in between runs", type=str)
+    cache_args.add_argument("--rebuild-size-cache", help="Discard all entries of the image size cache", action="store_true")
+    cache_args.add_argument(
+        "--manifest",
+        help="SQLite manifest of a previous run, only inventory numbers that changed since are separated again",
+        type=str,
+    )
+
+    journal_args = parser.add_argument_group("Journal")
+    journal_args.add_argument(
+        "--journal", help="SQLite file to checkpoint the completed inventory numbers in, removed when the run completes", type=str
+    )
+    journal_args.add_argument(
+        "--resume", help="Skip the inventory numbers already completed in the journal of an interrupted run", action="store_true"
+    )
+    journal_args.add_argument(
+        "--checkpoint-interval",
+        help="Number of completed inventory numbers after which the journal is committed",
+        type=int,
+        default=100,
+    )
 
-    args = parser.parse_args()
+    profile_args = parser.add_argument_group("Profile")
+    profile_args.add_argument("--profile", help="Json file to write stage timings and metrics of the run to", type=str)
+    profile_args.add_argument("--cprofile", help="File to dump cProfile stats of the main thread to", type=str)
+
+    args = parser.parse_args(argv)
     return args
 
 
-def get_size_match(image_size1, image_size2, margin):
+def get_size_match(image_size1, image_size2, margin, border_multiplier=0.01):
     min_multiplier = 1.0 - margin
     max_multiplier = 1.0 + margin
-    border_multiplier = 0.01
     image1_width = image_size1[0]
     image2_width = image_size2[0]
     image1_height = image_size1[1]
@@ -62,177 +180,539 @@ def get_size_match(image_size1, image_size2, margin):
     return False
 
 
+def separate_inventory(
+    inventory_dir: Path,
+    size_cache: Optional[ImageSizeCache] = None,
+    prober: Optional[AsyncImageSizeProber] = None,
+    profiler: Optional[StageProfiler] = None,
+    content_extractor: Optional[ContentFeatureExtractor] = None,
+    rules: Optional[SeparationRules] = None,
+) -> SeparatedInventory:
+    """
+    Separate the scans of a single inventory number into documents, based on the size of consecutive scans
+
+    Args:
+        inventory_dir (Path): dir containing the scans of one inventory number
+        size_cache (Optional[ImageSizeCache], optional): cache to get the image sizes from. Defaults to None.
+        prober (Optional[AsyncImageSizeProber], optional): prober to read the image sizes concurrently. Defaults to None.
+        profiler (Optional[StageProfiler], optional): profiler to record the stages in. Defaults to None.
+        content_extractor (Optional[ContentFeatureExtractor], optional): extractor of the content features, required by a content rule. Defaults to None.
+        rules (Optional[SeparationRules], optional): separation rules. Defaults to the rules of DEFAULT_RULES_CONFIG.
+
+    Returns:
+        SeparatedInventory: documents keyed by the name of their first scan, with the page "numbers", "sizes" and "paths"
+    """
+    if size_cache is not None:
+        get_image_size = size_cache.get
+    elif prober is None:
+        import imagesize
+
+        get_image_size = imagesize.get
+    if rules is None:
+        rules = SeparationRules.from_config(DEFAULT_RULES_CONFIG)
+
+    with profile_stage(profiler, "listing"):
+        image_names = scan_image_names(inventory_dir, supported_image_formats)
+    if len(image_names) == 0:
+        raise FileNotFoundError(f"No files found in the provided dir(s)/file(s) {inventory_dir}")
+
+    image_paths = [os.path.join(inventory_dir, image_name) for image_name in image_names]
+    with profile_stage(profiler, "probing"):
+        if prober is None:
+            image_sizes = [get_image_size(image_path) for image_path in image_paths]
+        else:
+            image_sizes = prober.probe(image_paths)
+    if profiler is not None:
+        profiler.count("images_probed", len(image_paths))
+
+    content_features = None
+    if content_extractor is not None:
+        with profile_stage(profiler, "content"):
+            content_features = content_extractor.get_features(image_paths)
+    del image_paths
+
+    with profile_stage(profiler, "separation"):
+        page_table = PageTable(image_names, image_sizes, content_features)
+        starts, page_numbers = rules.evaluate(page_table)
+
+    return SeparatedInventory(
+        inventory_dir,
+        image_names,
+        page_numbers.tolist(),
+        page_table.sizes[:, 0].tolist(),
+        page_table.sizes[:, 1].tolist(),
+        np.flatnonzero(starts).tolist(),
+    )
+
+
+def separate_inventory_incremental(
+    inventory_dir: Path,
+    previous_entry: Optional[dict[str, Any]] = None,
+    size_cache: Optional[ImageSizeCache] = None,
+    prober: Optional[AsyncImageSizeProber] = None,
+    profiler: Optional[StageProfiler] = None,
+    content_extractor: Optional[ContentFeatureExtractor] = None,
+    rules: Optional[SeparationRules] = None,
+) -> tuple[SeparatedInventory, dict[str, Any], bool]:
+    """
+    Separate the scans of a single inventory number, reuse the result of a previous run if the dir did not change
+
+    Args:
+        inventory_dir (Path): dir containing the scans of one inventory number
+        previous_entry (Optional[dict[str, Any]], optional): manifest entry of the previous run. Defaults to None.
+        size_cache (Optional[ImageSizeCache], optional): cache to get the image sizes from. Defaults to None.
+        prober (Optional[AsyncImageSizeProber], optional): prober to read the image sizes concurrently. Defaults to None.
+        profiler (Optional[StageProfiler], optional): profiler to record the stages and latency in. Defaults to None.
+        content_extractor (Optional[ContentFeatureExtractor], optional): extractor of the content features, required by a content rule. Defaults to None.
+        rules (Optional[SeparationRules], optional): separation rules. Defaults to the rules of DEFAULT_RULES_CONFIG.
+
+    Returns:
+        tuple[SeparatedInventory, dict[str, Any], bool]: documents, new manifest entry and if the inventory changed
+    """
+    start = time.perf_counter()
+    documents, entry, changed = _separate_inventory_incremental(
+        inventory_dir, previous_entry, size_cache, prober, profiler, content_extractor, rules
+    )
+    if profiler is not None:
+        profiler.record_inventory(inventory_dir.name, time.perf_counter() - start)
+    return documents, entry, changed
+
+
+def _separate_inventory_incremental(
+    inventory_dir: Path,
+    previous_entry: Optional[dict[str, Any]],
+    size_cache: Optional[ImageSizeCache],
+    prober: Optional[AsyncImageSizeProber],
+    profiler: Optional[StageProfiler],
+    content_extractor: Optional[ContentFeatureExtractor],
+    rules: Optional[SeparationRules],
+) -> tuple[SeparatedInventory, dict[str, Any], bool]:
+    """
+    Untimed body of separate_inventory_incremental
+    """
+    mtime_ns = inventory_dir.stat().st_mtime_ns
+    if previous_entry is not None and previous_entry["path"] == str(inventory_dir):
+        if previous_entry["mtime_ns"] == mtime_ns:
+            return deserialize_documents(inventory_dir, previous_entry["documents"]), previous_entry, False
+        if previous_entry["listing_hash"] == get_listing_hash(inventory_dir, supported_image_formats):
+            entry = previous_entry | {"mtime_ns": mtime_ns}
+            return deserialize_documents(inventory_dir, previous_entry["documents"]), entry, False
+
+    documents = separate_inventory(
+        inventory_dir,
+        size_cache=size_cache,
+        prober=prober,
+        profiler=profiler,
+        content_extractor=content_extractor,
+        rules=rules,
+    )
+    entry = {
+        "path": str(inventory_dir),
+        "mtime_ns": mtime_ns,
+        "listing_hash": get_names_hash(documents.get_names(0, documents.number_of_pages)),
+    }
+    return documents, entry, True
+
+
+def resume_or_separate_inventory(
+    inventory_dir: Path,
+    previous_entry: Optional[dict[str, Any]] = None,
+    journal_entry: Optional[dict[str, Any]] = None,
+    **kwargs,
+) -> tuple[SeparatedInventory, dict[str, Any], bool]:
+    """
+    Reuse the result of an interrupted run from the journal, or separate the scans of a single inventory number
+
+    Args:
+        inventory_dir (Path): dir containing the scans of one inventory number
+        previous_entry (Optional[dict[str, Any]], optional): manifest entry of the previous run. Defaults to None.
+        journal_entry (Optional[dict[str, Any]], optional): journal checkpoint of the interrupted run. Defaults to None.
+        **kwargs: passed on to separate_inventory_incremental
+
+    Returns:
+        tuple[SeparatedInventory, dict[str, Any], bool]: documents, new manifest entry and if the inventory changed
+    """
+    if journal_entry is not None:
+        documents = deserialize_documents(inventory_dir, journal_entry["documents"])
+        return documents, journal_entry["entry"], journal_entry["changed"]
+    return separate_inventory_incremental(inventory_dir, previous_entry, **kwargs)
+
+
+def discover_inventories(input_dirs: list[Path], shard: Optional[tuple[int, int]] = None) -> list[Path]:
+    """
+    Find the inventory dirs in all input dirs, before anything is separated or exported
+
+    Only the top level of the input dirs is listed, so duplicate inventory numbers are found before any output is
+    written, while the scans themselves are still listed one inventory number at a time.
+
+    Args:
+        input_dirs (list[Path]): dirs containing one dir per inventory number
+        shard (Optional[tuple[int, int]], optional): only return the inventory numbers of this shard. Defaults to None.
+
+    Raises:
+        ValueError: the same inventory number is found twice
+
+    Returns:
+        list[Path]: inventory dirs
+    """
+    inventory_dirs = []
+    seen_inventory_numbers = set()
+    for input_dir in input_dirs:
+        for sub_dir in scan_inventory_dirs(input_dir):
+            inventory_number = sub_dir.name
+            if inventory_number in seen_inventory_numbers:
+                raise ValueError(f"Duplicate inventory number: {inventory_number}")
+            seen_inventory_numbers.add(inventory_number)
+            if shard is not None and not in_shard(inventory_number, shard):
+                continue
+            inventory_dirs.append(sub_dir)
+    return inventory_dirs
+
+
+def read_inventories(stream: TextIO) -> Iterator[Path]:
+    """
+    Read inventory dirs from a stream, one per line, as they arrive and until the stream is closed
+
+    Args:
+        stream (TextIO): stream with one inventory dir per line, empty lines are ignored
+
+    Yields:
+        Iterator[Path]: inventory dirs, not checked to exist
+    """
+    for line in iter(stream.readline, ""):
+        line = line.strip()
+        if line:
+            yield Path(line).expanduser().resolve()
+
+
+def try_separate_inventory(inventory_dir: Path, *args, **kwargs) -> tuple[SeparatedInventory, dict[str, Any], bool] | Exception:
+    """
+    Separate the scans of a single inventory number, returning the error instead of raising it, so serving continues
+
+    Args:
+        inventory_dir (Path): dir containing the scans of one inventory number
+        *args: passed on to resume_or_separate_inventory
+        **kwargs: passed on to resume_or_separate_inventory
+
+    Returns:
+        tuple[SeparatedInventory, dict[str, Any], bool] | Exception: result of resume_or_separate_inventory, or the error
+    """
+    try:
+        if not inventory_dir.is_dir():
+            raise NotADirectoryError(f"Inventory dir {inventory_dir} is not a directory")
+        return resume_or_separate_inventory(inventory_dir, *args, **kwargs)
+    except (OSError, ValueError) as e:
+        return e
+
+
+def write_response(stream: TextIO, response: dict[str, Any]) -> None:
+    """
+    Write the response for one served inventory number as a single json line, flushed so the caller can act on it
+
+    Args:
+        stream (TextIO): stream to write to
+        response (dict[str, Any]): json serializable response
+    """
+    stream.write(json.dumps(response) + "\n")
+    stream.flush()
+
+
+def export_inventory_dirs(
+    inventory_number_dir: Path,
+    documents: SeparatedInventory,
+    copy_executor: ThreadPoolExecutor,
+    mode: str = "copy",
+) -> Counter:
+    """
+    Materialise the scans of an inventory number in one dir per document, only applying the difference with the output
+
+    Args:
+        inventory_number_dir (Path): output dir of the inventory number
+        documents (SeparatedInventory): documents with the page "paths"
+        copy_executor (ThreadPoolExecutor): pool to materialise the files with
+        mode (str, optional): given mode "symlink", "link", "reflink" or "copy". Defaults to "copy".
+
+    Returns:
+        Counter: number of "kept", "moved", "created" and "removed" files, and of "removed_dirs"
+    """
+    document_paths = {document_name: document["paths"] for document_name, document in documents.items()}
+    return materialise_inventory(inventory_number_dir, document_paths, copy_executor, mode)
+
+
 def main(args):
+    with profile_run(args.profile, args.cprofile) as profiler:
+        separate_and_export(args, profiler)
+    if args.profile:
+        logging.getLogger(__name__).info(f"Profile report saved to {args.profile}")
+
+
+def separate_and_export(args, profiler: StageProfiler):
     logger = logging.getLogger(__name__)
     logger.setLevel(logging.INFO)
     logging.basicConfig(format="%(levelname)s: %(message)s")
     logging.basicConfig(level=logging.INFO)
 
-    input_dirs = [Path(input_dir) for input_dir in args.input]
+    assert bool(args.input) != args.serve, "Provide either input dirs or --serve"
+    assert args.shard is None or not args.serve, "Sharding requires input dirs"
 
-    assert all([input_dir.is_dir() for input_dir in input_dirs]), "All input paths must be directories"
+    input_dirs = [Path(input_dir).expanduser().resolve() for input_dir in args.input or []]
 
-    separated_documents = {}
-    seen_inventory_numbers = set()
+    assert all([input_dir.is_dir() for input_dir in input_dirs]), "All input paths must be directories"
 
-    for input_dir in input_dirs:
-        for sub_dir in input_dir.glob("*/"):
+    # Duplicate inventory numbers are found before any output is opened, served inventory dirs are checked one by one
+    if args.serve:
+        inventory_dirs: Iterable[Path] = read_inventories(sys.stdin)
+    else:
+        with profiler.stage("discovery"):
+            inventory_dirs = discover_inventories(input_dirs, args.shard)
+
+    assert args.journal or not args.resume, "Resuming requires a journal"
+
+    rules = SeparationRules.from_file(args.rules)
+    if args.content_signal and not rules.requires_content:
+        content_threshold = args.content_threshold
+        if content_threshold is None:
+            content_threshold = DEFAULT_CONTENT_THRESHOLDS[args.content_signal]
+        rules.add(ContentRule(content_threshold))
+    assert args.content_signal or not rules.requires_content, "The content rule requires a --content-signal"
+
+    # Settings that change the separation result, empty for the default separation rules
+    settings = {}
+    if rules.to_config() != DEFAULT_RULES_CONFIG:
+        settings["rules"] = rules.to_config()
+    if args.content_signal:
+        settings["content_signal"] = args.content_signal
+
+    if args.output and args.output_mode == "xlsx":
+        assert args.output.endswith(".xlsx"), "Output file must be an xlsx file"
+    elif args.output and args.output_mode == "csv":
+        assert args.output.endswith(".csv"), "Output file must be a csv file"
+
+    with ExitStack() as stack:
+        # The writers are closed if the run fails, and neither the xlsx file nor the page index leave temporary files behind
+        output_writer = None
+        output_dir = None
+        if args.output and args.output_mode == "xlsx":
+            output_writer = stack.enter_context(XLSXSeparationWriter(args.output))
+        elif args.output and args.output_mode == "csv":
+            output_writer = stack.enter_context(CSVSeparationWriter(args.output))
+        elif args.output and args.output_mode == "dirs":
+            output_dir = Path(args.output)
+            output_dir.mkdir(parents=True, exist_ok=True)
+        page_index_writer = None
+        if args.page_index:
+            page_index_writer = stack.enter_context(PageIndexWriter(args.page_index))
+        size_cache = None
+        if args.size_cache:
+            size_cache = stack.enter_context(ImageSizeCache(args.size_cache, rebuild=args.rebuild_size_cache))
+        prober = None
+        if args.probe_backend == "async":
+            prober = stack.enter_context(
+                AsyncImageSizeProber(
+                    concurrency=args.probe_concurrency,
+                    get_image_size=None if size_cache is None else size_cache.get,
+                )
+            )
+        content_extractor = None
+        thumbnail_cache = None
+        if args.content_signal:
+            if args.thumbnail_cache:
+                thumbnail_cache = stack.enter_context(ThumbnailCache(args.thumbnail_cache))
+            content_extractor = stack.enter_context(
+                ContentFeatureExtractor(args.content_signal, processes=args.content_processes, cache=thumbnail_cache)
+            )
+        manifest = None
+        if args.manifest:
+            manifest = stack.enter_context(Manifest(args.manifest))
+            if manifest.settings != settings:
+                logger.info("Separation settings changed since the previous run, all inventory numbers are separated again")
+        copy_executor = None
+        if output_dir is not None:
+            copy_executor = stack.enter_context(ThreadPoolExecutor(max_workers=args.copy_workers))
+        # The copy mode only changes the output of the dirs output mode
+        copy_mode = args.copy_mode if args.output and args.output_mode == "dirs" else None
+        journal = None
+        if args.journal:
+            fingerprint = {
+                "input": [str(input_dir) for input_dir in input_dirs],
+                "output": None if args.output is None else str(Path(args.output).resolve()),
+                "output_mode": args.output_mode,
+                "copy_mode": copy_mode,
+                "shard": args.shard,
+                "manifest": None if args.manifest is None else str(Path(args.manifest).resolve()),
+                "settings": settings,
+            }
+            journal = stack.enter_context(
+                Journal(args.journal, fingerprint, resume=args.resume, checkpoint_interval=args.checkpoint_interval)
+            )
+            if args.resume:
+                logger.info(f"Resuming from journal {args.journal}: {journal.resumed} completed inventory numbers")
+
+        # Only update the inventory numbers that changed if the previous run wrote to the same dirs in the same way
+        incremental_dirs = (
+            manifest is not None
+            and output_dir is not None
+            and manifest.output == str(output_dir.resolve())
+            and manifest.output_mode == "dirs"
+            and manifest.copy_mode == copy_mode
+        )
+
+        separate = partial(
+            try_separate_inventory if args.serve else resume_or_separate_inventory,
+            size_cache=size_cache,
+            prober=prober,
+            profiler=profiler,
+            content_extractor=content_extractor,
+            rules=rules,
+        )
+        reuse_manifest = manifest is not None and manifest.settings == settings
+        if args.serve:
+            logger.info("Serving inventory dirs from stdin")
+        # Inventory numbers completed before an interrupt are read from the journal, in the same order as a full run
+        inventory_arguments = (
+            (
+                sub_dir,
+                manifest.get(sub_dir.name) if reuse_manifest else None,
+                journal.get(sub_dir.name) if args.resume else None,
+            )
+            for sub_dir in inventory_dirs
+        )
+
+        if args.shard is not None:
+            logger.info(f"Processing shard {args.shard[0]}/{args.shard[1]}")
+
+        served_inventory_numbers = set()
+        total_inventory_numbers = 0
+        total_changed_inventory_numbers = 0
+        total_documents = 0
+        length_of_documents = Counter()
+
+        # Every inventory number flows through separation, statistics and export, and is released afterwards
+        for i, ((sub_dir, _, journal_entry), result) in enumerate(
+            ordered_map(separate, inventory_arguments, workers=args.workers, blocking_input=args.serve), start=1
+        ):
             inventory_number = sub_dir.name
-            if inventory_number in seen_inventory_numbers:
-                raise ValueError(f"Duplicate inventory number: {inventory_number}")
-            seen_inventory_numbers.add(inventory_number)
-
-            separated_documents[inventory_number] = {}
-            current_document = None
-            previous_image_size = None
-            i = 0
-            for image_path in get_file_paths(sub_dir, supported_image_formats, disable_check=True):
-                if i == 0:
-                    image_size = imagesize.get(image_path)
-                    current_document = image_path.name
-                    separated_documents[inventory_number][current_document] = {
-                        "numbers": [i + 1],
-                        "sizes": [image_size],
-                        "paths": [image_path],
-                    }
-                else:
-                    image_size = imagesize.get(image_path)
-                    # check if ends in deelopname1, deelopname2, etc.
-                    if re.match(r".*deelopname\d+$", image_path.stem):
-                        separated_documents[inventory_number][current_document]["numbers"].append(i)
-                        separated_documents[inventory_number][current_document]["sizes"].append(image_size)
-                        separated_documents[inventory_number][current_document]["paths"].append(image_path)
-                        continue
-                    if get_size_match(previous_image_size, image_size, 0.1):
-                        separated_documents[inventory_number][current_document]["numbers"].append(i + 1)
-                        separated_documents[inventory_number][current_document]["sizes"].append(image_size)
-                        separated_documents[inventory_number][current_document]["paths"].append(image_path)
+            if args.serve:
+                # Served inventory numbers are not discovered up front, so bad or duplicate paths are answered one by one
+                if not isinstance(result, Exception) and inventory_number in served_inventory_numbers:
+                    result = ValueError(f"Duplicate inventory number: {inventory_number}")
+                if isinstance(result, Exception):
+                    logger.error(f"[{i}] Inventory number {inventory_number}: {result}")
+                    profiler.count("failed_inventories")
+                    write_response(sys.stdout, {"path": str(sub_dir), "error": str(result)})
+                    continue
+                served_inventory_numbers.add(inventory_number)
+            documents, entry, changed = result
+            resumed = journal_entry is not None
+
+            total_inventory_numbers += 1
+            total_documents += len(documents)
+            length_of_documents.update(documents.document_lengths())
+            if len(documents) < 1:
+                logger.warning(f"Inventory number {inventory_number} has no documents")
+
+            profiler.count("inventories")
+            profiler.count("documents", len(documents))
+            profiler.count("images", documents.number_of_pages)
+            if changed:
+                total_changed_inventory_numbers += 1
+                profiler.count("changed_inventories")
+
+            if output_writer is not None:
+                with profiler.stage("export"):
+                    output_writer.add_inventory(inventory_number, documents)
+            # The dirs of a resumed inventory number were already materialised before the interrupt
+            elif output_dir is not None and not resumed and (changed or not incremental_dirs):
+                with profiler.stage("copy"):
+                    materialise_counts = export_inventory_dirs(
+                        output_dir.joinpath(inventory_number), documents, copy_executor, args.copy_mode
+                    )
+                for action, count in materialise_counts.items():
+                    profiler.count(f"files_{action}" if action != "removed_dirs" else action, count)
+            if page_index_writer is not None:
+                with profiler.stage("page_index"):
+                    page_index_writer.add_inventory(inventory_number, documents)
+
+            if manifest is not None:
+                with profiler.stage("manifest"):
+                    if changed:
+                        manifest.put(inventory_number, entry | {"documents": serialize_documents(documents)})
                     else:
-                        current_document = image_path.name
-                        separated_documents[inventory_number][current_document] = {
-                            "numbers": [i + 1],
-                            "sizes": [image_size],
-                            "paths": [image_path],
-                        }
-                previous_image_size = image_size
-                i += 1
-
-    for inventory_number, documents in separated_documents.items():
-        if len(documents) < 1:
-            print(f"Inventory number {inventory_number} has no documents")
-            continue
-
-    total_documents = 0
-    length_of_documents = Counter()
-
-    for inventory_number, documents in separated_documents.items():
-        total_documents += len(documents)
-        length_of_documents += Counter([len(document["numbers"]) for document in documents.values()])
-
-    logger.info(f"Total inventory numbers: {len(separated_documents)}")
-    logger.info(
-        f"Total scans: {sum(length*number_of_documents for length, number_of_documents in length_of_documents.items())}"
-    )
-    logger.info(f"Total documents: {total_documents}")
-    logger.info(f"Document lengths: {OrderedDict(sorted(length_of_documents.items()))}")
-
-    if not args.output:
-        return
-
-    if args.output_mode == "xlsx":
-        assert args.output.endswith(".xlsx"), "Output file must be an xlsx file"
-
-        workbook = Workbook()
-        workbook.remove(workbook["Sheet"])
-
-        main_sheet = workbook.create_sheet("Main")
-
-        main_a_title = "Inventory number"
-        main_b_title = "Dossier link"
-        main_c_title = "Number of documents"
-
-        main_sheet["A1"] = main_a_title
-        main_sheet["B1"] = main_b_title
-        main_sheet["C1"] = main_c_title
-
-        main_a_width = len(main_a_title)
-        main_b_width = len(main_b_title)
-        main_c_width = len(main_c_title)
-
-        for i, (inventory_number, documents) in enumerate(separated_documents.items(), start=2):
-            main_sheet[f"A{i}"] = inventory_number
-            main_sheet[f"A{i}"].hyperlink = f"#'{inventory_number}'!A1"
-            spinque_link = f"https://cloud.spinque.com/oorlogvoorderechter/explore/dossier/{inventory_number}"
-            main_sheet[f"B{i}"] = spinque_link
-            main_sheet[f"B{i}"].hyperlink = spinque_link
-            main_sheet[f"C{i}"] = len(documents)
-
-            main_a_width = max(main_a_width, len(str(inventory_number)))
-            main_b_width = max(main_b_width, len(str(spinque_link)))
-            main_c_width = max(main_c_width, len(str(len(documents))))
-
-            inventory_sheet = workbook.create_sheet(inventory_number)
-            inventory_a_title = "Start of document"
-            inventory_b_title = "Scan name"
-            inventory_c_title = "Number of pages"
-            inventory_d_title = "Page numbers"
-            inventory_sheet["A1"] = inventory_a_title
-            inventory_sheet["B1"] = inventory_b_title
-            inventory_sheet["C1"] = inventory_c_title
-            inventory_sheet["D1"] = inventory_d_title
-            length_a = len(inventory_a_title)
-            length_b = len(inventory_b_title)
-            length_c = len(inventory_c_title)
-            length_d = len(inventory_d_title)
-
-            for j, (document_name, document) in enumerate(documents.items(), start=2):
-                spinque_link = (
-                    f"https://cloud.spinque.com/oorlogvoorderechter/explore/dossier/{inventory_number}/{document['numbers'][0]}"
+                        manifest.keep(inventory_number, entry["mtime_ns"])
+
+            if journal is not None and not resumed:
+                with profiler.stage("journal"):
+                    journal.add(inventory_number, entry, documents, changed)
+
+            logger.info(
+                f"[{i}] Inventory number {inventory_number}: {len(documents)} documents"
+                + ("" if changed else " (unchanged)")
+                + (" (resumed)" if resumed else "")
+            )
+            if args.serve:
+                write_response(
+                    sys.stdout,
+                    {
+                        "path": str(sub_dir),
+                        "inventory_number": inventory_number,
+                        "documents": len(documents),
+                        "pages": documents.number_of_pages,
+                        "changed": changed,
+                    },
                 )
-                length_a = max(length_a, len(str(spinque_link)))
-                inventory_sheet[f"A{j}"] = spinque_link
-                inventory_sheet[f"A{j}"].hyperlink = spinque_link
-
-                length_b = max(length_b, len(document_name))
-                inventory_sheet[f"B{j}"] = document_name
-
-                number_of_pages = len(document["numbers"])
-                length_c = max(length_c, len(str(number_of_pages)))
-                inventory_sheet[f"C{j}"] = number_of_pages
-
-                page_numbers = ",".join(map(str, document["numbers"]))
-                length_d = min(100, max(length_d, len(page_numbers)))
-                inventory_sheet[f"D{j}"] = page_numbers
-
-            inventory_sheet.column_dimensions["A"].width = length_a
-            inventory_sheet.column_dimensions["B"].width = length_b
-            inventory_sheet.column_dimensions["C"].width = length_c
-            inventory_sheet.column_dimensions["D"].width = length_d
-
-        main_sheet.column_dimensions["A"].width = main_a_width
-        main_sheet.column_dimensions["B"].width = main_b_width
-        main_sheet.column_dimensions["C"].width = main_c_width
-
-        output_path = Path(args.output)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        workbook.save(output_path)
-        logger.info(f"Separation ground truth saved to {output_path}")
-
-    if args.output_mode == "dirs":
-        output_dir = Path(args.output)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        for inventory_number, documents in separated_documents.items():
-            inventory_number_dir = output_dir.joinpath(inventory_number)
-            inventory_number_dir.mkdir(parents=True, exist_ok=True)
-            for document_name, document in documents.items():
-                document_dir = inventory_number_dir.joinpath(document_name)
-                document_dir.mkdir(parents=True, exist_ok=True)
-                for image_path in document["paths"]:
-                    copy_mode(image_path, document_dir / image_path.name)
-
-        logger.info(f"Separation ground truth saved to {output_dir}")
+
+        if size_cache is not None:
+            logger.info(f"Image size cache: {size_cache.hits} hits, {size_cache.misses} misses")
+            profiler.count("size_cache_hits", size_cache.hits)
+            profiler.count("size_cache_misses", size_cache.misses)
+        if thumbnail_cache is not None:
+            logger.info(f"Thumbnail cache: {thumbnail_cache.hits} hits, {thumbnail_cache.misses} misses")
+            profiler.count("thumbnail_cache_hits", thumbnail_cache.hits)
+            profiler.count("thumbnail_cache_misses", thumbnail_cache.misses)
+
+        logger.info(f"Total inventory numbers: {total_inventory_numbers}")
+        logger.info(
+            f"Total scans: {sum(length*number_of_documents for length, number_of_documents in length_of_documents.items())}"
+        )
+        logger.info(f"Total documents: {total_documents}")
+        logger.info(f"Document lengths: {OrderedDict(sorted(length_of_documents.items()))}")
+
+        if manifest is not None:
+            # With a shard, the inventory numbers of the other shards are not removed, only not seen. When serving, the
+            # inventory numbers that were not requested are not removed either
+            removed_inventory_numbers = [
+                inventory_number
+                for inventory_number in manifest.get_unseen()
+                if not args.serve and (args.shard is None or in_shard(inventory_number, args.shard))
+            ]
+            logger.info(
+                f"Changed inventory numbers: {total_changed_inventory_numbers}, removed inventory numbers: {len(removed_inventory_numbers)}"
+            )
+            if incremental_dirs:
+                for inventory_number in removed_inventory_numbers:
+                    inventory_number_dir = output_dir.joinpath(inventory_number)
+                    if inventory_number_dir.is_dir():
+                        remove_tree(inventory_number_dir)
+            manifest.remove(removed_inventory_numbers)
+            manifest.set_settings(settings)
+            if args.output:
+                manifest.set_output(str(Path(args.output).resolve()), args.output_mode, copy_mode)
+            else:
+                manifest.set_output(None, None)
+
+        if output_writer is not None:
+            with profiler.stage("save"):
+                output_writer.save()
+            logger.info(f"Separation ground truth saved to {output_writer.output_path}")
+        if page_index_writer is not None:
+            with profiler.stage("save"):
+                page_index_writer.save()
+            logger.info(f"Page index saved to {page_index_writer.output_path}")
+        if output_dir is not None:
+            logger.info(f"Separation ground truth saved to {output_dir}")
+
+    if manifest is not None:
+        logger.info(f"Manifest saved to {args.manifest}")
 
 
 if __name__ == "__main__":
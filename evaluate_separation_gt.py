@@ -0,0 +1,217 @@
+import csv
+import itertools
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+
+from utils.evaluation_utils import evaluate_rules, get_rules_config
+from utils.input_utils import supported_image_formats
+from utils.replay_utils import (
+    is_manifest,
+    read_page_tables_csv,
+    read_page_tables_manifest,
+    read_page_tables_size_cache,
+)
+from utils.rule_utils import PageTable, SeparationRules
+from utils.xlsx_utils import read_document_starts_xlsx
+
+REPORT_COLUMNS = (
+    "margin",
+    "border_multiplier",
+    "true_positives",
+    "false_positives",
+    "false_negatives",
+    "precision",
+    "recall",
+    "f1",
+    "pages",
+    "seconds",
+    "pages_per_second",
+)
+
+
+def get_arguments():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Sweep the size rule parameters and score the separation against corrected ground truth"
+    )
+    io_args = parser.add_argument_group("IO")
+    io_args.add_argument(
+        "-g", "--ground-truth", help="Corrected separation xlsx files", nargs="+", action="extend", type=str, required=True
+    )
+    io_args.add_argument(
+        "-s",
+        "--sizes",
+        help="Separation csv files (--output-mode csv), manifests (--manifest, .sqlite) or image size caches (--size-cache, .sqlite) with the page sizes",
+        nargs="+",
+        action="extend",
+        type=str,
+        required=True,
+    )
+    io_args.add_argument("-o", "--output", help="Csv file to write the scores of every setting to", type=str)
+
+    sweep_args = parser.add_argument_group("Sweep")
+    sweep_args.add_argument(
+        "--rules",
+        help="Json config with the separation rules to sweep the size rule of, defaults to the rules of create_separation_gt.py",
+        type=str,
+    )
+    margin_args = sweep_args.add_mutually_exclusive_group()
+    margin_args.add_argument("--margin", help="Margins to evaluate", nargs="+", type=float, default=[0.1])
+    margin_args.add_argument(
+        "--margin-range", help="Evaluate NUM margins from START to STOP", nargs=3, type=float, metavar=("START", "STOP", "NUM")
+    )
+    border_args = sweep_args.add_mutually_exclusive_group()
+    border_args.add_argument("--border-multiplier", help="Border multipliers to evaluate", nargs="+", type=float, default=[0.01])
+    border_args.add_argument(
+        "--border-multiplier-range",
+        help="Evaluate NUM border multipliers from START to STOP",
+        nargs=3,
+        type=float,
+        metavar=("START", "STOP", "NUM"),
+    )
+    sweep_args.add_argument("-w", "--workers", help="Number of processes to evaluate settings in parallel", type=int, default=1)
+
+    args = parser.parse_args()
+    return args
+
+
+def get_values(values: Sequence[float], value_range: Optional[Sequence[float]]) -> list[float]:
+    """
+    Get the values to sweep from a list or a range
+
+    Args:
+        values (Sequence[float]): explicit values
+        value_range (Optional[Sequence[float]]): start, stop and number of values, overrides the explicit values
+
+    Returns:
+        list[float]: values to sweep
+    """
+    if value_range is None:
+        return list(values)
+    start, stop, num = value_range
+    return np.linspace(start, stop, int(num)).tolist()
+
+
+# Loaded once per worker process by the initializer, instead of being sent along with every setting
+_page_tables: Mapping[str, PageTable] = {}
+_ground_truth: Mapping[str, Sequence[int]] = {}
+
+
+def _init_worker(page_tables: Mapping[str, PageTable], ground_truth: Mapping[str, Sequence[int]]) -> None:
+    global _page_tables, _ground_truth
+    _page_tables = page_tables
+    _ground_truth = ground_truth
+
+
+def evaluate_setting(base_config: dict[str, Any], margin: float, border_multiplier: float) -> dict[str, Any]:
+    """
+    Score one setting of the size rule against the ground truth of the worker
+
+    Args:
+        base_config (dict[str, Any]): rules config with at least one size rule
+        margin (float): relative margin within which sizes are considered similar
+        border_multiplier (float): relative width of the border of a single page in a double page scan
+
+    Returns:
+        dict[str, Any]: setting, boundary counts, scores and throughput
+    """
+    rules = SeparationRules.from_config(get_rules_config(base_config, margin, border_multiplier))
+    return {"margin": margin, "border_multiplier": border_multiplier} | evaluate_rules(rules, _page_tables, _ground_truth)
+
+
+def main(args):
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+
+    ground_truth_paths = [Path(path) for path in args.ground_truth]
+    size_paths = [Path(path) for path in args.sizes]
+
+    assert all([path.is_file() for path in ground_truth_paths + size_paths]), "All input paths must be files"
+    assert all([path.suffix in (".csv", ".sqlite") for path in size_paths]), "Sizes must be csv files, sqlite manifests or sqlite size caches"
+
+    base_config = SeparationRules.from_file(args.rules).to_config()
+    assert not SeparationRules.from_config(base_config).requires_content, "The content rule cannot be evaluated from sizes only"
+    margins = get_values(args.margin, args.margin_range)
+    border_multipliers = get_values(args.border_multiplier, args.border_multiplier_range)
+
+    ground_truth = {}
+    for path in ground_truth_paths:
+        for inventory_number, document_starts in read_document_starts_xlsx(path):
+            if inventory_number in ground_truth:
+                raise ValueError(f"Duplicate inventory number in the ground truth: {inventory_number}")
+            ground_truth[inventory_number] = document_starts
+
+    # Cache the page tables of the ground truth inventory numbers once, every setting is evaluated from memory
+    page_tables = {}
+    for path in size_paths:
+        if path.suffix == ".csv":
+            source = read_page_tables_csv(path)
+        elif is_manifest(path):
+            source = read_page_tables_manifest(path)
+        else:
+            logger.warning(
+                f"Reading the sizes from the size cache {path}, scans removed or renamed since they were probed are "
+                "included, use a manifest for the exact listing"
+            )
+            source = read_page_tables_size_cache(path, supported_image_formats)
+        for inventory_number, _, page_table in source:
+            if inventory_number in ground_truth and inventory_number not in page_tables:
+                page_tables[inventory_number] = page_table
+
+    missing = [inventory_number for inventory_number in ground_truth if inventory_number not in page_tables]
+    if missing:
+        logger.warning(f"No page sizes for {len(missing)} inventory numbers of the ground truth, skipped: {missing}")
+        ground_truth = {key: value for key, value in ground_truth.items() if key in page_tables}
+    assert ground_truth, "No inventory numbers with both ground truth and page sizes"
+
+    settings = list(itertools.product(margins, border_multipliers))
+    logger.info(
+        f"Evaluating {len(settings)} settings on {len(ground_truth)} inventory numbers, "
+        f"{sum(len(page_tables[key]) for key in ground_truth)} pages"
+    )
+
+    start = time.perf_counter()
+    if args.workers <= 1:
+        _init_worker(page_tables, ground_truth)
+        results = [evaluate_setting(base_config, margin, border_multiplier) for margin, border_multiplier in settings]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_init_worker, initargs=(page_tables, ground_truth)
+        ) as executor:
+            results = list(
+                executor.map(
+                    evaluate_setting,
+                    itertools.repeat(base_config),
+                    *zip(*settings),
+                    chunksize=max(1, len(settings) // (args.workers * 4)),
+                )
+            )
+    seconds = time.perf_counter() - start
+    logger.info(f"Evaluated {len(settings)} settings in {seconds:.2f}s ({len(settings) / seconds:.1f} settings/s)")
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with output_path.open(mode="w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(results)
+        logger.info(f"Scores saved to {output_path}")
+
+    for result in sorted(results, key=lambda result: result["f1"], reverse=True)[:5]:
+        logger.info(
+            f"margin {result['margin']:.4g}, border multiplier {result['border_multiplier']:.4g}: "
+            f"precision {result['precision']:.4f}, recall {result['recall']:.4f}, F1 {result['f1']:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    main(args)
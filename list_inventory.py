@@ -1,8 +1,13 @@
 import logging
 import random
+import time
 from pathlib import Path
+from typing import Optional
 
-from utils.input_utils import get_file_paths, supported_image_formats
+from utils.input_utils import count_image_files, scan_inventory_dirs, supported_image_formats
+from utils.pipeline_utils import ordered_map
+from utils.profile_utils import StageProfiler, profile_run, profile_stage
+from utils.shard_utils import in_shard, parse_shard
 
 
 def get_arguments():
@@ -12,12 +17,48 @@ def get_arguments():
     io_args = parser.add_argument_group("IO")
     io_args.add_argument("-i", "--input", help="Train input folder/file", nargs="+", action="extend", type=str, required=True)
     io_args.add_argument("-o", "--output", required=True, help="Output folder", type=str)
+    parser.add_argument("--shard", help="Only list shard i of N (zero based, as i/N)", type=parse_shard)
+    parser.add_argument("-w", "--workers", help="Number of inventory dirs to count in parallel", type=int, default=8)
+    parser.add_argument("--seed", help="Seed for the shuffle of the inventory numbers, for a reproducible list", type=int)
+    parser.add_argument(
+        "--counts", help="Write the number of images after each inventory number, separated by a tab", action="store_true"
+    )
+
+    profile_args = parser.add_argument_group("Profile")
+    profile_args.add_argument("--profile", help="Json file to write stage timings and metrics of the run to", type=str)
+    profile_args.add_argument("--cprofile", help="File to dump cProfile stats of the main thread to", type=str)
 
     args = parser.parse_args()
     return args
 
 
 def main(args):
+    with profile_run(args.profile, args.cprofile) as profiler:
+        list_inventories(args, profiler)
+    if args.profile:
+        logging.getLogger(__name__).info(f"Profile report saved to {args.profile}")
+
+
+def count_inventory(inventory_dir: Path, profiler: Optional[StageProfiler] = None) -> int:
+    """
+    Count the images of a single inventory dir, and record the latency
+
+    Args:
+        inventory_dir (Path): dir containing the scans of one inventory number
+        profiler (Optional[StageProfiler], optional): profiler to record the stages and latency in. Defaults to None.
+
+    Returns:
+        int: number of images
+    """
+    start = time.perf_counter()
+    with profile_stage(profiler, "listing"):
+        number_of_images = count_image_files(inventory_dir, supported_image_formats)
+    if profiler is not None:
+        profiler.record_inventory(inventory_dir.name, time.perf_counter() - start)
+    return number_of_images
+
+
+def list_inventories(args, profiler: StageProfiler):
     logger = logging.getLogger(__name__)
     logging.basicConfig(level=logging.INFO)
 
@@ -30,30 +71,47 @@ def main(args):
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
+    # Check for duplicates before counting, so no time is spent on an archive that cannot be listed
+    inventory_dirs = []
+    seen_inventory_numbers = set()
+    with profiler.stage("discovery"):
+        for input_dir in input_dirs:
+            for inventory_dir in scan_inventory_dirs(input_dir):
+                if args.shard is not None and not in_shard(inventory_dir.name, args.shard):
+                    continue
+                if inventory_dir.name in seen_inventory_numbers:
+                    raise ValueError(f"Duplicate inventory directory name: {inventory_dir.name}")
+                seen_inventory_numbers.add(inventory_dir.name)
+                inventory_dirs.append(inventory_dir)
+
     total = {}
-    for input_dir in input_dirs:
-        inventory_dirs = [path for path in input_dir.iterdir() if path.is_dir()]
-        for inventory_dir in inventory_dirs:
-            image_paths = get_file_paths(inventory_dir, supported_image_formats, disable_check=True)
-            if inventory_dir.name in total:
-                raise ValueError(f"Duplicate inventory directory name: {inventory_dir.name}")
-
-            total.update({inventory_dir.name: len(image_paths)})
-            if not image_paths:
-                logger.warning(f"No images found in {inventory_dir}")
-                continue
+    for (inventory_dir, _), number_of_images in ordered_map(
+        count_inventory, ((inventory_dir, profiler) for inventory_dir in inventory_dirs), workers=args.workers
+    ):
+        profiler.count("inventories")
+        profiler.count("images", number_of_images)
+        total[inventory_dir.name] = number_of_images
+        if number_of_images == 0:
+            logger.warning(f"No images found in {inventory_dir}")
+        else:
+            logger.info(f"Found {number_of_images} images in {inventory_dir}")
+
+    with profiler.stage("write"), open(output_path, "w") as output_file:
+        inventory_numbers = list(total.keys())
+        random.Random(args.seed).shuffle(inventory_numbers)
+        for inventory_number in inventory_numbers:
+            if args.counts:
+                output_file.write(f"{inventory_number}\t{total[inventory_number]}\n")
             else:
-                logger.info(f"Found {len(image_paths)} images in {inventory_dir}")
-
-    with open(output_path, "w") as output_file:
-        inventory_dirs = list(total.keys())
-        random.shuffle(inventory_dirs)
-        for inventory_dir in inventory_dirs:
-            output_file.write(f"{inventory_dir.name}\n")
+                output_file.write(f"{inventory_number}\n")
 
     logger.info(f"Total images found: {sum(total.values())}")
-    logger.info(f"Max images found: {max(total.values())}")
-    logger.info(f"Min images found: {min(total.values())}")
+    # A shard of a small or skewed archive can be empty, which is not an error
+    if total:
+        logger.info(f"Max images found: {max(total.values())}")
+        logger.info(f"Min images found: {min(total.values())}")
+    else:
+        logger.warning("No inventory numbers found" + ("" if args.shard is None else f" in shard {args.shard[0]}/{args.shard[1]}"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+import logging
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from utils.csv_utils import CSVSeparationWriter, read_separation_csv
+from utils.xlsx_utils import XLSXSeparationWriter
+
+
+def get_arguments():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge the partial separation ground truth of multiple shards")
+    io_args = parser.add_argument_group("IO")
+    io_args.add_argument(
+        "-i", "--input", help="Partial csv files of the shards", nargs="+", action="extend", type=str, required=True
+    )
+    io_args.add_argument("-o", "--output", help="Output file", type=str, required=True)
+
+    parser.add_argument(
+        "-m",
+        "--output-mode",
+        help="Output mode",
+        type=str,
+        choices=["xlsx", "csv"],
+        default="xlsx",
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+def main(args):
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+
+    input_paths = [Path(input_path) for input_path in args.input]
+
+    assert all([input_path.is_file() for input_path in input_paths]), "All input paths must be files"
+
+    if args.output_mode == "xlsx":
+        assert args.output.endswith(".xlsx"), "Output file must be an xlsx file"
+        output_writer = XLSXSeparationWriter(args.output)
+    elif args.output_mode == "csv":
+        assert args.output.endswith(".csv"), "Output file must be a csv file"
+        output_path = Path(args.output)
+        assert all(
+            [not output_path.exists() or not output_path.samefile(input_path) for input_path in input_paths]
+        ), "Output file must not be one of the input files"
+        output_writer = CSVSeparationWriter(output_path)
+    else:
+        raise NotImplementedError(f"Output mode {args.output_mode} not implemented")
+
+    seen_inventory_numbers = {}
+    total_documents = 0
+    length_of_documents = Counter()
+
+    for input_path in input_paths:
+        for inventory_number, documents in read_separation_csv(input_path):
+            if inventory_number in seen_inventory_numbers:
+                raise ValueError(
+                    f"Duplicate inventory number: {inventory_number} (in {seen_inventory_numbers[inventory_number]} and {input_path})"
+                )
+            seen_inventory_numbers[inventory_number] = input_path
+
+            total_documents += len(documents)
+            length_of_documents.update(len(document["numbers"]) for document in documents.values())
+            output_writer.add_inventory(inventory_number, documents)
+        logger.info(f"Merged {input_path}")
+
+    output_writer.save()
+
+    logger.info(f"Total inventory numbers: {len(seen_inventory_numbers)}")
+    logger.info(
+        f"Total scans: {sum(length*number_of_documents for length, number_of_documents in length_of_documents.items())}"
+    )
+    logger.info(f"Total documents: {total_documents}")
+    logger.info(f"Document lengths: {OrderedDict(sorted(length_of_documents.items()))}")
+    logger.info(f"Separation ground truth saved to {output_writer.output_path}")
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    main(args)
@@ -0,0 +1,48 @@
+import json
+import logging
+import sys
+from pathlib import Path
+
+from utils.page_index_utils import PageIndex
+
+
+def get_arguments():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Look up the document and file of pages in a page index written with create_separation_gt.py --page-index"
+    )
+    io_args = parser.add_argument_group("IO")
+    io_args.add_argument("-i", "--input", help="Page index file", type=str, required=True)
+
+    parser.add_argument("-n", "--inventory-number", help="Inventory number", type=str, required=True)
+    parser.add_argument("-p", "--page-number", help="Page numbers to look up", nargs="+", action="extend", type=int, required=True)
+
+    args = parser.parse_args()
+    return args
+
+
+def main(args):
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+
+    index_path = Path(args.input)
+
+    assert index_path.is_file(), "Input path must be a file"
+
+    # One json line per scan on stdout, a page continued on the next scan (deelopname) has more than one
+    with PageIndex(index_path) as page_index:
+        if page_index.find_inventory(args.inventory_number) is None:
+            raise KeyError(f"Inventory number {args.inventory_number} is not in the page index {index_path}")
+        for page_number in args.page_number:
+            pages = page_index.get_pages(args.inventory_number, page_number)
+            if not pages:
+                logger.warning(f"Inventory number {args.inventory_number} has no page {page_number}")
+            for page in pages:
+                sys.stdout.write(json.dumps(page) + "\n")
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    main(args)
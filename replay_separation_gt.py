@@ -0,0 +1,139 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from utils.csv_utils import CSVSeparationWriter
+from utils.input_utils import supported_image_formats
+from utils.replay_utils import (
+    is_manifest,
+    read_page_tables_csv,
+    read_page_tables_manifest,
+    read_page_tables_size_cache,
+)
+from utils.rule_utils import SeparationRules
+from utils.separation_utils import SeparatedInventory
+from utils.xlsx_utils import XLSXSeparationWriter
+
+
+def get_arguments():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Separate again with different rules, from the sizes of a previous run only, without touching the scans"
+    )
+    io_args = parser.add_argument_group("IO")
+    io_args.add_argument(
+        "-i",
+        "--input",
+        help="Separation csv files (--output-mode csv), manifests (--manifest, .sqlite) or image size caches (--size-cache, .sqlite) of previous runs",
+        nargs="+",
+        action="extend",
+        type=str,
+        required=True,
+    )
+    io_args.add_argument("-o", "--output", help="Output file", type=str)
+
+    parser.add_argument(
+        "-m",
+        "--output-mode",
+        help="Output mode",
+        type=str,
+        choices=["xlsx", "csv"],
+        default="xlsx",
+    )
+    parser.add_argument(
+        "--rules",
+        help="Json config with the separation rules, defaults to the deelopname pattern and a size margin of 0.1",
+        type=str,
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+def main(args):
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+
+    input_paths = [Path(input_path) for input_path in args.input]
+
+    assert all([input_path.is_file() for input_path in input_paths]), "All input paths must be files"
+    assert all(
+        [input_path.suffix in (".csv", ".sqlite") for input_path in input_paths]
+    ), "All input paths must be csv files, sqlite manifests or sqlite size caches"
+
+    rules = SeparationRules.from_file(args.rules)
+    assert not rules.requires_content, "The content rule cannot be replayed from sizes only"
+
+    output_writer = None
+    if args.output and args.output_mode == "xlsx":
+        assert args.output.endswith(".xlsx"), "Output file must be an xlsx file"
+        output_writer = XLSXSeparationWriter(args.output)
+    elif args.output and args.output_mode == "csv":
+        assert args.output.endswith(".csv"), "Output file must be a csv file"
+        output_path = Path(args.output)
+        assert all(
+            [not output_path.exists() or not output_path.samefile(input_path) for input_path in input_paths]
+        ), "Output file must not be one of the input files"
+        output_writer = CSVSeparationWriter(output_path)
+
+    start = time.perf_counter()
+    seen_inventory_numbers = {}
+    total_documents = 0
+    length_of_documents = Counter()
+
+    for input_path in input_paths:
+        if input_path.suffix == ".csv":
+            page_tables = read_page_tables_csv(input_path)
+        elif is_manifest(input_path):
+            page_tables = read_page_tables_manifest(input_path)
+        else:
+            logger.warning(
+                f"Replaying from the size cache {input_path}, scans removed or renamed since they were probed are "
+                "included, replay from a manifest for the exact listing"
+            )
+            page_tables = read_page_tables_size_cache(input_path, supported_image_formats)
+
+        for inventory_number, inventory_dir, page_table in page_tables:
+            if inventory_number in seen_inventory_numbers:
+                raise ValueError(
+                    f"Duplicate inventory number: {inventory_number} (in {seen_inventory_numbers[inventory_number]} and {input_path})"
+                )
+            seen_inventory_numbers[inventory_number] = input_path
+
+            starts, page_numbers = rules.evaluate(page_table)
+            documents = SeparatedInventory(
+                inventory_dir,
+                page_table.names,
+                page_numbers.tolist(),
+                page_table.sizes[:, 0].tolist(),
+                page_table.sizes[:, 1].tolist(),
+                np.flatnonzero(starts).tolist(),
+            )
+
+            total_documents += len(documents)
+            length_of_documents.update(documents.document_lengths())
+            if output_writer is not None:
+                output_writer.add_inventory(inventory_number, documents)
+        logger.info(f"Replayed {input_path}")
+
+    logger.info(f"Total inventory numbers: {len(seen_inventory_numbers)}")
+    logger.info(
+        f"Total scans: {sum(length*number_of_documents for length, number_of_documents in length_of_documents.items())}"
+    )
+    logger.info(f"Total documents: {total_documents}")
+    logger.info(f"Document lengths: {OrderedDict(sorted(length_of_documents.items()))}")
+    logger.info(f"Replayed in {time.perf_counter() - start:.2f}s")
+
+    if output_writer is not None:
+        output_writer.save()
+        logger.info(f"Separation ground truth saved to {output_writer.output_path}")
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    main(args)
@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.materialise_utils import materialise_inventory
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+@pytest.fixture
+def scans(tmp_path):
+    input_dir = tmp_path.joinpath("input")
+    input_dir.mkdir()
+    scans = []
+    for i in range(6):
+        scan = input_dir.joinpath(f"scan_{i}.jpg")
+        scan.write_bytes(bytes([i]) * (i + 1))
+        scans.append(scan)
+    return scans
+
+
+def list_tree(inventory_number_dir):
+    return {
+        document_dir.name: sorted(path.name for path in document_dir.iterdir())
+        for document_dir in inventory_number_dir.iterdir()
+    }
+
+
+def test_materialise_new_inventory(tmp_path, scans, executor):
+    output_dir = tmp_path.joinpath("output", "NL-0")
+
+    counts = materialise_inventory(output_dir, {"scan_0": scans[:3], "scan_3": scans[3:]}, executor)
+
+    assert counts == {"created": 6}
+    assert list_tree(output_dir) == {
+        "scan_0": ["scan_0.jpg", "scan_1.jpg", "scan_2.jpg"],
+        "scan_3": ["scan_3.jpg", "scan_4.jpg", "scan_5.jpg"],
+    }
+    assert output_dir.joinpath("scan_3", "scan_4.jpg").read_bytes() == scans[4].read_bytes()
+
+
+def test_materialise_changed_boundaries(tmp_path, scans, executor):
+    output_dir = tmp_path.joinpath("output", "NL-0")
+    materialise_inventory(output_dir, {"scan_0": scans[:3], "scan_3": scans[3:]}, executor)
+    kept_inode = output_dir.joinpath("scan_0", "scan_0.jpg").stat().st_ino
+    moved_inode = output_dir.joinpath("scan_3", "scan_4.jpg").stat().st_ino
+
+    # scan_5 is gone from the input, scan_4 starts a new document and scan_3 joins the first document
+    counts = materialise_inventory(output_dir, {"scan_0": scans[:4], "scan_4": scans[4:5]}, executor)
+
+    assert counts == {"kept": 3, "moved": 2, "removed": 1, "removed_dirs": 1}
+    assert list_tree(output_dir) == {
+        "scan_0": ["scan_0.jpg", "scan_1.jpg", "scan_2.jpg", "scan_3.jpg"],
+        "scan_4": ["scan_4.jpg"],
+    }
+    assert output_dir.joinpath("scan_0", "scan_0.jpg").stat().st_ino == kept_inode
+    assert output_dir.joinpath("scan_4", "scan_4.jpg").stat().st_ino == moved_inode
+
+
+def test_materialise_replaces_outdated_files(tmp_path, scans, executor):
+    output_dir = tmp_path.joinpath("output", "NL-0")
+    materialise_inventory(output_dir, {"scan_0": scans}, executor)
+    scans[2].write_bytes(b"changed")
+
+    counts = materialise_inventory(output_dir, {"scan_0": scans}, executor)
+
+    assert counts == {"kept": 5, "created": 1}
+    assert output_dir.joinpath("scan_0", "scan_2.jpg").read_bytes() == b"changed"
+
+
+def test_materialise_removes_leftovers(tmp_path, scans, executor):
+    output_dir = tmp_path.joinpath("output", "NL-0")
+    materialise_inventory(output_dir, {"scan_0": scans}, executor)
+    # Leftovers of an interrupted run: a document dir under its temporary name and temporary files
+    temporary_dir = output_dir.joinpath(".scan_3.0123abcd.tmp")
+    temporary_dir.mkdir()
+    temporary_dir.joinpath("scan_3.jpg").write_bytes(b"partial")
+    output_dir.joinpath("scan_0", ".scan_1.jpg.0123abcd.tmp").write_bytes(b"partial")
+    output_dir.joinpath(".stray.0123abcd.tmp").write_bytes(b"partial")
+
+    counts = materialise_inventory(output_dir, {"scan_0": scans}, executor)
+
+    assert counts == {"kept": 6, "removed": 3, "removed_dirs": 1}
+    assert list_tree(output_dir) == {"scan_0": sorted(scan.name for scan in scans)}
+
+
+@pytest.mark.parametrize("mode", ["copy", "symlink"])
+def test_materialise_switch_from_link(tmp_path, scans, executor, mode):
+    output_dir = tmp_path.joinpath("output", "NL-0")
+    materialise_inventory(output_dir, {"scan_0": scans}, executor, mode="link")
+    assert all(output_dir.joinpath("scan_0", scan.name).stat().st_ino == scan.stat().st_ino for scan in scans)
+
+    counts = materialise_inventory(output_dir, {"scan_0": scans}, executor, mode=mode)
+
+    assert counts == {"created": 6}
+    for scan in scans:
+        destination = output_dir.joinpath("scan_0", scan.name)
+        assert os.path.islink(destination) == (mode == "symlink")
+        if mode == "copy":
+            assert destination.stat().st_ino != scan.stat().st_ino
+        assert destination.read_bytes() == scan.read_bytes()
+    # The input is not touched by replacing its hardlinks
+    assert all(scan.stat().st_nlink == 1 for scan in scans)
+
+    assert materialise_inventory(output_dir, {"scan_0": scans}, executor, mode=mode) == {"kept": 6}
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from utils.page_index_utils import PageIndex, PageIndexWriter
+from utils.rule_utils import DEFAULT_RULES_CONFIG, PageTable, SeparationRules
+from utils.separation_utils import SeparatedInventory
+from utils.xlsx_utils import XLSXSeparationWriter
+
+INVENTORIES = {
+    "NL-10": (
+        ["a_deelopname1.jpg", "b.jpg", "c.jpg", "c_deelopname1.jpg", "c_deelopname2.jpg", "d.jpg", "e.jpg"],
+        [(100, 100), (1000, 1000), (1000, 1000), (10, 10), (5000, 5000), (2000, 2000), (2000, 2000)],
+    ),
+    "NL-2": (["a.png", "b.png"], [(500, 700), (2000, 1500)]),
+    "NL-1": ([], []),
+}
+
+
+def separate(inventory_dir, names, sizes):
+    starts, page_numbers = SeparationRules.from_config(DEFAULT_RULES_CONFIG).evaluate(PageTable(names, sizes))
+    return SeparatedInventory(
+        inventory_dir,
+        names,
+        page_numbers.tolist(),
+        [width for width, _ in sizes],
+        [height for _, height in sizes],
+        [i for i, start in enumerate(starts) if start],
+    )
+
+
+@pytest.fixture
+def page_index_path(tmp_path):
+    index_path = tmp_path.joinpath("pages.idx")
+    with PageIndexWriter(index_path) as writer:
+        for inventory_number, (names, sizes) in INVENTORIES.items():
+            writer.add_inventory(inventory_number, separate(tmp_path.joinpath(inventory_number), names, sizes))
+        writer.save()
+    return index_path
+
+
+def test_page_index_round_trip(tmp_path, page_index_path):
+    with PageIndex(page_index_path) as index:
+        assert len(index) == 9
+        assert [index.get_inventory_number(index.find_inventory(key)) for key in INVENTORIES] == list(INVENTORIES)
+        assert index.find_inventory("NL-3") is None
+
+        # Page 1 of NL-10 is only a deelopname, page 3 is continued on two more scans
+        assert index.get_pages("NL-10", 1) == [
+            {
+                "inventory_number": "NL-10",
+                "page_number": 1,
+                "document": "a_deelopname1.jpg",
+                "document_start": 1,
+                "width": 100,
+                "height": 100,
+                "path": str(tmp_path.joinpath("NL-10", "a_deelopname1.jpg")),
+            }
+        ]
+        pages = index.get_pages("NL-10", 3)
+        assert [page["path"] for page in pages] == [
+            str(tmp_path.joinpath("NL-10", name)) for name in ("c.jpg", "c_deelopname1.jpg", "c_deelopname2.jpg")
+        ]
+        assert {(page["document"], page["document_start"]) for page in pages} == {("b.jpg", 2)}
+        assert [(page["width"], page["height"]) for page in pages] == [(1000, 1000), (10, 10), (5000, 5000)]
+        assert [(page["document"], page["document_start"]) for page in index.get_pages("NL-10", 5)] == [("d.jpg", 4)]
+
+        assert [page["document"] for page in index.get_pages("NL-2", 2)] == ["b.png"]
+
+
+def test_page_index_missing_pages(page_index_path):
+    with PageIndex(page_index_path) as index:
+        assert index.get_pages("NL-10", 0) == []
+        assert index.get_pages("NL-10", 6) == []
+        assert index.get_pages("NL-1", 1) == []
+        with pytest.raises(KeyError):
+            index.get_pages("NL-3", 1)
+
+
+def test_page_index_duplicate_inventory_number(tmp_path):
+    with PageIndexWriter(tmp_path.joinpath("pages.idx")) as writer:
+        writer.add_inventory("NL-2", separate(tmp_path, *INVENTORIES["NL-2"]))
+        with pytest.raises(ValueError):
+            writer.add_inventory("NL-2", separate(tmp_path, *INVENTORIES["NL-2"]))
+
+
+def test_failed_run_leaves_no_temporary_files(tmp_path, page_index_path):
+    output_dir = tmp_path.joinpath("output")
+    index_path = output_dir.joinpath("pages.idx")
+    xlsx_path = output_dir.joinpath("separation.xlsx")
+    index_path.parent.mkdir()
+    index_path.write_bytes(page_index_path.read_bytes())
+
+    with pytest.raises(RuntimeError):
+        with PageIndexWriter(index_path) as index_writer, XLSXSeparationWriter(xlsx_path) as xlsx_writer:
+            documents = separate(tmp_path.joinpath("NL-2"), *INVENTORIES["NL-2"])
+            index_writer.add_inventory("NL-2", documents)
+            xlsx_writer.add_inventory("NL-2", documents)
+            temporary_sheets = [sheet._writer.out for sheet in xlsx_writer.workbook.worksheets if sheet._writer]
+            raise RuntimeError("Separation failed")
+
+    # The index of the previous run is kept as it was
+    assert os.listdir(output_dir) == ["pages.idx"]
+    assert index_path.read_bytes() == page_index_path.read_bytes()
+    assert temporary_sheets and not any(os.path.exists(path) for path in temporary_sheets)
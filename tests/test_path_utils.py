@@ -0,0 +1,131 @@
+import threading
+
+import pytest
+
+from utils.path_utils import (
+    PairingIndex,
+    UniquePathAllocator,
+    image_paths_to_xml_paths,
+    unique_path,
+    xml_paths_to_image_paths,
+)
+
+
+def touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return path
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    image_dir = tmp_path.joinpath("images")
+    for name in ("scan_1.jpg", "scan_10.jpg", "scan_2.png", "scan_3_extra.jpg", "scan_4.jpg", "scan_4.png", "notes.txt"):
+        touch(image_dir.joinpath(name))
+    for name in ("scan_1.xml", "scan_10.xml", "scan_2.xml", "scan_3.xml", "scan_4.xml"):
+        touch(image_dir.joinpath("page", name))
+    return image_dir
+
+
+def test_xml_paths_to_image_paths_matches_exact_stem(image_dir):
+    xml_dir = image_dir.joinpath("page")
+
+    image_paths = xml_paths_to_image_paths([xml_dir.joinpath("scan_1.xml"), xml_dir.joinpath("scan_10.xml")])
+
+    # scan_1 is not matched by scan_10.jpg as a prefix, and the other way around
+    assert image_paths == [image_dir.joinpath("scan_1.jpg"), image_dir.joinpath("scan_10.jpg")]
+
+
+def test_xml_paths_to_image_paths_does_not_match_prefix(image_dir):
+    with pytest.raises(FileNotFoundError):
+        xml_paths_to_image_paths([image_dir.joinpath("page", "scan_3.xml")])
+
+
+def test_xml_paths_to_image_paths_picks_first_natsorted_image(image_dir):
+    assert xml_paths_to_image_paths([image_dir.joinpath("page", "scan_4.xml")]) == [image_dir.joinpath("scan_4.jpg")]
+
+
+def test_image_paths_to_xml_paths_keeps_input_order(image_dir, tmp_path):
+    other_dir = tmp_path.joinpath("other")
+    touch(other_dir.joinpath("a.jpg"))
+    touch(other_dir.joinpath("page", "a.xml"))
+    image_paths = [
+        image_dir.joinpath("scan_10.jpg"),
+        other_dir.joinpath("a.jpg"),
+        image_dir.joinpath("scan_1.jpg"),
+        image_dir.joinpath("scan_2.png"),
+    ]
+
+    xml_paths = image_paths_to_xml_paths(image_paths)
+
+    assert xml_paths == [
+        image_dir.joinpath("page", "scan_10.xml"),
+        other_dir.joinpath("page", "a.xml"),
+        image_dir.joinpath("page", "scan_1.xml"),
+        image_dir.joinpath("page", "scan_2.xml"),
+    ]
+
+
+def test_image_paths_to_xml_paths_missing_xml(image_dir):
+    image_path = image_dir.joinpath("scan_3_extra.jpg")
+
+    with pytest.raises(FileNotFoundError):
+        image_paths_to_xml_paths([image_path])
+    assert image_paths_to_xml_paths([image_path], check=False) == [image_dir.joinpath("page", "scan_3_extra.xml")]
+
+
+def test_pairing_index_pairs_in_natsorted_order(image_dir):
+    pairs = list(PairingIndex(image_dir).pairs())
+
+    assert pairs == [
+        (image_dir.joinpath("scan_1.jpg"), image_dir.joinpath("page", "scan_1.xml")),
+        (image_dir.joinpath("scan_2.png"), image_dir.joinpath("page", "scan_2.xml")),
+        (image_dir.joinpath("scan_3_extra.jpg"), None),
+        (image_dir.joinpath("scan_4.jpg"), image_dir.joinpath("page", "scan_4.xml")),
+        (image_dir.joinpath("scan_4.png"), image_dir.joinpath("page", "scan_4.xml")),
+        (image_dir.joinpath("scan_10.jpg"), image_dir.joinpath("page", "scan_10.xml")),
+    ]
+
+
+def test_unique_path_allocator_matches_unique_path(tmp_path):
+    existing_names = ["a.jpg", "a(1).jpg", "a(3).jpg", "b(2).png", "c.tar.gz", "d"]
+    names = ["a.jpg", "a.jpg", "a(1).jpg", "a(3).jpg", "b(2).png", "b(2).png", "b.png", "c.tar.gz", "d", "d", "e.jpg"]
+    unique_dir = tmp_path.joinpath("unique_path")
+    allocator_dir = tmp_path.joinpath("allocator")
+    for directory in (unique_dir, allocator_dir):
+        directory.mkdir()
+        for name in existing_names:
+            touch(directory.joinpath(name))
+
+    expected = []
+    for name in names:
+        path = unique_path(unique_dir.joinpath(name))
+        touch(path)
+        expected.append(path.name)
+    allocator = UniquePathAllocator(allocator_dir)
+    allocated = [allocator.allocate(name) for name in names]
+
+    assert [path.name for path in allocated] == expected
+    assert all(path.parent == allocator_dir for path in allocated)
+
+
+def test_unique_path_allocator_concurrent_allocations_are_distinct(tmp_path):
+    touch(tmp_path.joinpath("scan.jpg"))
+    allocator = UniquePathAllocator(tmp_path)
+    barrier = threading.Barrier(8)
+    allocated = [[] for _ in range(8)]
+
+    def allocate(paths):
+        barrier.wait()
+        for _ in range(200):
+            paths.append(allocator.allocate("scan.jpg"))
+
+    threads = [threading.Thread(target=allocate, args=(paths,)) for paths in allocated]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    names = {path.name for paths in allocated for path in paths}
+    assert len(names) == 8 * 200
+    assert names == {f"scan({count}).jpg" for count in range(1, 8 * 200 + 1)}
@@ -0,0 +1,42 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from utils.pipeline_utils import ordered_map
+
+
+def double(x, delay):
+    time.sleep(delay)
+    return 2 * x
+
+
+@pytest.mark.parametrize("blocking_input", [False, True])
+@pytest.mark.parametrize("workers", [1, 4])
+def test_ordered_map_keeps_input_order(workers, blocking_input):
+    arguments = [(i, 0.001 * (i % 3)) for i in range(50)]
+
+    results = list(ordered_map(double, iter(arguments), workers=workers, blocking_input=blocking_input))
+
+    assert results == [(argument, 2 * argument[0]) for argument in arguments]
+
+
+def test_ordered_map_blocking_input_yields_without_more_input():
+    requests = queue.Queue()
+
+    def read_requests():
+        while (request := requests.get()) is not None:
+            yield request
+
+    results = ordered_map(double, read_requests(), workers=4, blocking_input=True)
+    responses = queue.Queue()
+    consumer = threading.Thread(target=lambda: responses.put(next(results)), daemon=True)
+    consumer.start()
+
+    # A caller that sends one request waits for its response before sending the next one
+    requests.put((1, 0.0))
+    assert responses.get(timeout=5) == ((1, 0.0), 2)
+
+    requests.put(None)
+    assert list(results) == []
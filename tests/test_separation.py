@@ -0,0 +1,130 @@
+import os
+import random
+import re
+
+import numpy as np
+import pytest
+
+from create_separation_gt import get_size_match
+from utils.rule_utils import DEFAULT_RULES_CONFIG, PageTable, SeparationRules
+from utils.separation_utils import get_size_matches
+
+DEELOPNAME_PATTERN = re.compile(r".*deelopname\d+$")
+
+
+def separate_scalar(names, sizes, margin=0.1, border_multiplier=0.01):
+    """
+    Reference separation, the scan by scan loop of the original create_separation_gt.py
+    """
+    starts = []
+    page_numbers = []
+    previous_size = None
+    i = 0
+    for name, size in zip(names, sizes):
+        if i > 0 and DEELOPNAME_PATTERN.match(os.path.splitext(name)[0]):
+            starts.append(False)
+            page_numbers.append(i)
+            continue
+        starts.append(i == 0 or not get_size_match(previous_size, size, margin, border_multiplier))
+        page_numbers.append(i + 1)
+        previous_size = size
+        i += 1
+    return starts, page_numbers
+
+
+def get_edge_size(rng, previous_size, margin=0.1, border_multiplier=0.01):
+    """
+    Size close to a boundary of get_size_match relative to the previous size, or a random size
+    """
+    width, height = previous_size
+    widths = [
+        width,
+        width * (1 - margin),
+        width * (1 + margin),
+        2 * width * (1 - border_multiplier) * (1 - margin),
+        2 * width * (1 - border_multiplier) * (1 + margin),
+        2 * width * (1 - border_multiplier),
+        width * (1 - margin) / (2 - border_multiplier),
+        width * (1 + margin) / (2 - border_multiplier),
+        width / (2 - border_multiplier),
+        rng.randint(1, 5000),
+    ]
+    heights = [height, height * (1 - margin), height * (1 + margin), rng.randint(1, 5000)]
+    return (
+        max(1, round(rng.choice(widths)) + rng.randint(-1, 1)),
+        max(1, round(rng.choice(heights)) + rng.randint(-1, 1)),
+    )
+
+
+def get_random_inventory(rng):
+    """
+    Random names and sizes of an inventory number, with deelopname scans at the start and in runs
+    """
+    names = []
+    sizes = []
+    size = (rng.choice([100, 1000, 2000, 2480, 3508]), rng.choice([100, 1000, 1500, 3508]))
+    page = 0
+    for _ in range(rng.randint(1, 40)):
+        kind = rng.random()
+        if kind < 0.25 and names:
+            # Deelopname runs continue the last regular scan, their size is arbitrary
+            names.append(f"scan_{page:04d}_deelopname{rng.randint(1, 3)}.jpg")
+            sizes.append(get_edge_size(rng, size))
+            continue
+        if kind < 0.3:
+            names.append(f"scan_{page:04d}_deelopname{rng.randint(1, 3)}.jpg")
+        elif kind < 0.35:
+            # Almost a deelopname, but not matched by the pattern
+            names.append(rng.choice([f"scan_{page:04d}_deelopname.jpg", f"scan_{page:04d}_deelopname1x.png"]))
+        else:
+            names.append(f"scan_{page:04d}.{rng.choice(['jpg', 'png', 'tif'])}")
+        size = get_edge_size(rng, size)
+        sizes.append(size)
+        page += 1
+    return names, sizes
+
+
+@pytest.mark.parametrize("margin", [0.1, 0.05, 0.2])
+def test_get_size_matches_equals_get_size_match(margin):
+    rng = random.Random(margin)
+    previous_sizes = []
+    sizes = []
+    for _ in range(5000):
+        previous_size = (rng.randint(1, 5000), rng.randint(1, 5000))
+        previous_sizes.append(previous_size)
+        sizes.append(get_edge_size(rng, previous_size, margin))
+
+    matches = get_size_matches(np.array(previous_sizes), np.array(sizes), margin, 0.01)
+    expected = [get_size_match(previous_size, size, margin, 0.01) for previous_size, size in zip(previous_sizes, sizes)]
+
+    assert matches.tolist() == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_default_rules_equal_scalar_separation(seed):
+    rng = random.Random(seed)
+    rules = SeparationRules.from_config(DEFAULT_RULES_CONFIG)
+    for _ in range(1000):
+        names, sizes = get_random_inventory(rng)
+        starts, page_numbers = rules.evaluate(PageTable(names, sizes))
+        expected_starts, expected_page_numbers = separate_scalar(names, sizes)
+
+        assert starts.tolist() == expected_starts, names
+        assert page_numbers.tolist() == expected_page_numbers, names
+
+
+def test_leading_and_consecutive_deelopname():
+    names = ["a_deelopname1.jpg", "a_deelopname2.jpg", "b.jpg", "b_deelopname1.jpg", "b_deelopname2.jpg", "c.jpg"]
+    sizes = [(100, 100), (1000, 1000), (1000, 1000), (10, 10), (5000, 5000), (2000, 2000)]
+    starts, page_numbers = SeparationRules.from_config(DEFAULT_RULES_CONFIG).evaluate(PageTable(names, sizes))
+
+    assert (starts.tolist(), page_numbers.tolist()) == separate_scalar(names, sizes)
+    assert starts.tolist() == [True, False, True, False, False, True]
+    assert page_numbers.tolist() == [1, 1, 2, 2, 2, 3]
+
+
+def test_empty_inventory():
+    starts, page_numbers = SeparationRules.from_config(DEFAULT_RULES_CONFIG).evaluate(PageTable([], []))
+
+    assert len(starts) == 0
+    assert len(page_numbers) == 0
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class ImageSizeCache:
+    """
+    Persistent cache of image sizes, keyed by the path of the image and validated with its size and modification time
+    """
+
+    def __init__(self, cache_path: str | Path, rebuild: bool = False, commit_interval: int = 1000) -> None:
+        """
+        Persistent cache of image sizes, keyed by the path of the image and validated with its size and modification time
+
+        Args:
+            cache_path (str | Path): path to the SQLite cache file
+            rebuild (bool, optional): Flag to drop all existing entries. Defaults to False.
+            commit_interval (int, optional): number of new entries after which the cache is committed to disk. Defaults to 1000.
+        """
+        cache_path = Path(cache_path)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.cache_path = cache_path
+        self.commit_interval = commit_interval
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        if rebuild:
+            self.connection.execute("DROP TABLE IF EXISTS image_sizes")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS image_sizes (
+                path TEXT PRIMARY KEY,
+                st_size INTEGER NOT NULL,
+                st_mtime_ns INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def get(self, image_path: str | Path) -> tuple[int, int]:
+        """
+        Get the size of an image, read the image header only if the cached entry is missing or stale
+
+        Args:
+            image_path (str | Path): path to the image
+
+        Returns:
+            tuple[int, int]: width and height of the image
+        """
+        key = os.fspath(image_path)
+        stat = os.stat(key)
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT st_size, st_mtime_ns, width, height FROM image_sizes WHERE path = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                self.hits += 1
+                return row[2], row[3]
+
+        import imagesize
+
+        image_size = imagesize.get(key)
+
+        with self.lock:
+            self.misses += 1
+            self.connection.execute(
+                "INSERT OR REPLACE INTO image_sizes (path, st_size, st_mtime_ns, width, height) VALUES (?, ?, ?, ?, ?)",
+                (key, stat.st_size, stat.st_mtime_ns, image_size[0], image_size[1]),
+            )
+            self.pending += 1
+            if self.pending >= self.commit_interval:
+                self.connection.commit()
+                self.pending = 0
+
+        return image_size
+
+    def close(self) -> None:
+        """
+        Commit the remaining entries and close the cache
+        """
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+    def __enter__(self) -> "ImageSizeCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
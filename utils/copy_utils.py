@@ -1,12 +1,30 @@
 import errno
 import os
 import shutil
+import uuid
 from pathlib import Path
 
+# ioctl request to clone a file on copy-on-write filesystems (btrfs, xfs), from linux/fs.h
+FICLONE = 0x40049409
+
+
+def get_temporary_path(destination: str | Path) -> str:
+    """
+    Get a unique hidden path next to the destination, to create a file at before moving it into place
+
+    Args:
+        destination (str | Path): output path
+
+    Returns:
+        str: temporary path in the same dir, so it can be moved to the destination with os.replace
+    """
+    directory, name = os.path.split(os.fspath(destination))
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+
 
 def symlink_force(path: str | Path, destination: str | Path) -> None:
     """
-    Force a symlink, remove the file if it already exists
+    Force a symlink, replace the file atomically if it already exists
 
     Args:
         path (str | Path): input path
@@ -24,15 +42,16 @@ def symlink_force(path: str | Path, destination: str | Path) -> None:
         os.symlink(path, destination)
     except OSError as e:
         if e.errno == errno.EEXIST:
-            os.remove(destination)
-            os.symlink(path, destination)
+            temporary_path = get_temporary_path(destination)
+            os.symlink(path, temporary_path)
+            os.replace(temporary_path, destination)
         else:
             raise e
 
 
 def link_force(path: str | Path, destination: str | Path) -> None:
     """
-    Force a link, remove the file if it already exists
+    Force a link, replace the file atomically if it already exists
 
     Args:
         path (str | Path): input path
@@ -50,15 +69,16 @@ def link_force(path: str | Path, destination: str | Path) -> None:
         os.link(path, destination)
     except OSError as e:
         if e.errno == errno.EEXIST:
-            os.remove(destination)
-            os.link(path, destination)
+            temporary_path = get_temporary_path(destination)
+            os.link(path, temporary_path)
+            os.replace(temporary_path, destination)
         else:
             raise e
 
 
 def copy(path: str | Path, destination: str | Path) -> None:
     """
-    Copy a file, ignore if they point to the same file
+    Copy a file including its modification time, ignore if they point to the same file
 
     Args:
         path (str | Path): input path
@@ -67,20 +87,48 @@ def copy(path: str | Path, destination: str | Path) -> None:
     path = os.path.realpath(path)
 
     try:
-        shutil.copy(path, destination)
+        shutil.copy2(path, destination)
     except shutil.SameFileError:
         # code when Exception occur
         pass
 
 
+def reflink(path: str | Path, destination: str | Path) -> None:
+    """
+    Clone a file so it shares its data blocks with the original, fall back to a copy if the filesystem does not support it
+
+    Args:
+        path (str | Path): input path
+        destination (str | Path): output path
+
+    Raises:
+        e: Any uncaught error from the FICLONE ioctl
+    """
+    import fcntl
+
+    path = os.path.realpath(path)
+
+    if os.path.exists(destination) and os.path.samefile(path, destination):
+        return
+    try:
+        with open(path, "rb") as src, open(destination, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError as e:
+        if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL):
+            copy(path, destination)
+            return
+        raise e
+    shutil.copystat(path, destination)
+
+
 def copy_mode(path: str | Path, destination: str | Path, mode: str = "copy") -> None:
     """
-    Copy the a file from one place to another, use linking if mode is specified as "symlink" or "link"
+    Copy the a file from one place to another, use linking if mode is specified as "symlink", "link" or "reflink"
 
     Args:
         path (str | Path): input path
         destination (str | Path): output path
-        mode (str, optional): given mode "symlink", "link" or "copy". Defaults to "copy".
+        mode (str, optional): given mode "symlink", "link", "reflink" or "copy". Defaults to "copy".
 
     Raises:
         NotImplementedError: if specified mode is not known
@@ -91,5 +139,72 @@ def copy_mode(path: str | Path, destination: str | Path, mode: str = "copy") ->
         link_force(path, destination)
     elif mode == "symlink":
         symlink_force(path, destination)
+    elif mode == "reflink":
+        reflink(path, destination)
     else:
         raise NotImplementedError(f"Mode {mode} not implemented")
+
+
+def is_materialised(path: str | Path, destination: str | Path, mode: str = "copy") -> bool:
+    """
+    Check if the destination is already the result of materialising the input with the given mode
+
+    Args:
+        path (str | Path): input path
+        destination (str | Path): output path
+        mode (str, optional): given mode "symlink", "link", "reflink" or "copy". Defaults to "copy".
+
+    Returns:
+        bool: True if the destination is a symlink to the input for "symlink", the same inode as the input for "link",
+            or a regular file with the same size and modification time as the input, but not the same inode, for "copy"
+            and "reflink"
+    """
+    try:
+        destination_stat = os.lstat(destination)
+    except FileNotFoundError:
+        return False
+    if mode == "symlink":
+        return os.path.islink(destination) and os.readlink(destination) == os.path.realpath(path)
+    if os.path.islink(destination):
+        return False
+    path_stat = os.stat(path)
+    same_inode = path_stat.st_ino == destination_stat.st_ino and path_stat.st_dev == destination_stat.st_dev
+    if mode == "link":
+        return same_inode
+    # A hardlink has the size and modification time of the input as well, but is not a copy of it
+    return (
+        not same_inode
+        and path_stat.st_size == destination_stat.st_size
+        and path_stat.st_mtime_ns == destination_stat.st_mtime_ns
+    )
+
+
+def atomic_copy_mode(path: str | Path, destination: str | Path, mode: str = "copy") -> None:
+    """
+    Materialise a file at a temporary path and move it into place, so the destination is never partially written
+
+    Args:
+        path (str | Path): input path
+        destination (str | Path): output path, replaced if it already exists
+        mode (str, optional): given mode "symlink", "link", "reflink" or "copy". Defaults to "copy".
+
+    Raises:
+        NotImplementedError: if specified mode is not known
+    """
+    temporary_path = get_temporary_path(destination)
+    try:
+        if mode == "copy":
+            shutil.copy2(os.path.realpath(path), temporary_path)
+        elif mode == "link":
+            os.link(os.path.realpath(path), temporary_path)
+        elif mode == "symlink":
+            os.symlink(os.path.realpath(path), temporary_path)
+        elif mode == "reflink":
+            reflink(path, temporary_path)
+        else:
+            raise NotImplementedError(f"Mode {mode} not implemented")
+        os.replace(temporary_path, destination)
+    except BaseException:
+        if os.path.lexists(temporary_path):
+            os.remove(temporary_path)
+        raise
@@ -0,0 +1,107 @@
+import csv
+import os
+from pathlib import Path
+from typing import Iterator, Mapping, Sequence
+
+from utils.separation_utils import SeparatedInventory
+
+CSV_COLUMNS = ("inventory_number", "document", "document_start", "page_number", "width", "height", "path")
+
+
+class CSVSeparationWriter:
+    """
+    Write the separation ground truth to a single csv file with one row per page, one inventory number at a time
+    """
+
+    def __init__(self, output_path: str | Path) -> None:
+        """
+        Write the separation ground truth to a single csv file with one row per page, one inventory number at a time
+
+        Args:
+            output_path (str | Path): path to the csv file
+        """
+        self.output_path = Path(output_path)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.file = self.output_path.open(mode="w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(CSV_COLUMNS)
+
+    def add_inventory(self, inventory_number: str, documents: Mapping[str, Mapping[str, Sequence]]) -> None:
+        """
+        Write the pages of all documents of an inventory number
+
+        Args:
+            inventory_number (str): inventory number
+            documents (Mapping[str, Mapping[str, Sequence]]): documents with the page "numbers", "sizes" and "paths"
+        """
+        for document_name, document in documents.items():
+            document_start = document["numbers"][0]
+            self.writer.writerows(
+                (inventory_number, document_name, document_start, number, size[0], size[1], str(path))
+                for number, size, path in zip(document["numbers"], document["sizes"], document["paths"])
+            )
+        self.file.flush()
+
+    def save(self) -> None:
+        """
+        Close the csv file
+        """
+        self.file.close()
+
+    def abort(self) -> None:
+        """
+        Close the csv file if it was not saved, the inventory numbers written so far are kept
+        """
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self) -> "CSVSeparationWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.abort()
+
+
+def read_separation_csv(input_path: str | Path) -> Iterator[tuple[str, SeparatedInventory]]:
+    """
+    Read the separation ground truth from a csv file, one inventory number at a time
+
+    Args:
+        input_path (str | Path): path to the csv file
+
+    Raises:
+        ValueError: csv file does not have the expected columns
+
+    Yields:
+        Iterator[tuple[str, SeparatedInventory]]: inventory number and its documents with the page "numbers", "sizes" and "paths"
+    """
+    with Path(input_path).open(mode="r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None or tuple(header) != CSV_COLUMNS:
+            raise ValueError(f"Invalid separation csv file {input_path}: columns {header}")
+
+        current_inventory_number = None
+        current_document_name = None
+        inventory_dir = None
+        pages = ([], [], [], [], [])
+        for inventory_number, document_name, _document_start, page_number, width, height, path in reader:
+            if inventory_number != current_inventory_number:
+                if current_inventory_number is not None:
+                    yield current_inventory_number, SeparatedInventory(inventory_dir, *pages)
+                current_inventory_number = inventory_number
+                current_document_name = None
+                inventory_dir = os.path.dirname(path)
+                pages = ([], [], [], [], [])
+            names, page_numbers, widths, heights, document_starts = pages
+            if document_name != current_document_name:
+                current_document_name = document_name
+                document_starts.append(len(names))
+            names.append(os.path.relpath(path, inventory_dir))
+            page_numbers.append(int(page_number))
+            widths.append(int(width))
+            heights.append(int(height))
+
+        if current_inventory_number is not None:
+            yield current_inventory_number, SeparatedInventory(inventory_dir, *pages)
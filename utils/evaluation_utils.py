@@ -0,0 +1,110 @@
+import copy
+import time
+from typing import Any, Mapping, Sequence
+
+import numpy as np
+
+from utils.rule_utils import PageTable, SeparationRules
+
+
+def get_boundary_counts(predicted_starts: Sequence[int], true_starts: Sequence[int]) -> tuple[int, int, int]:
+    """
+    Compare the predicted document starts of an inventory number with the ground truth
+
+    The first page always starts a document, so it is not counted.
+
+    Args:
+        predicted_starts (Sequence[int]): page numbers that start a document according to the separation
+        true_starts (Sequence[int]): page numbers that start a document according to the ground truth
+
+    Returns:
+        tuple[int, int, int]: true positives, false positives and false negatives
+    """
+    predicted = set(predicted_starts)
+    truth = set(true_starts)
+    predicted.discard(1)
+    truth.discard(1)
+    true_positives = len(predicted & truth)
+    return true_positives, len(predicted) - true_positives, len(truth) - true_positives
+
+
+def get_scores(true_positives: int, false_positives: int, false_negatives: int) -> dict[str, float]:
+    """
+    Compute precision, recall and F1 from boundary counts
+
+    Args:
+        true_positives (int): correctly predicted document starts
+        false_positives (int): predicted document starts that are not in the ground truth
+        false_negatives (int): document starts in the ground truth that were not predicted
+
+    Returns:
+        dict[str, float]: "precision", "recall" and "f1", 1.0 if there is nothing to predict or nothing was predicted
+    """
+    precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 1.0
+    recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def get_rules_config(base_config: dict[str, Any], margin: float, border_multiplier: float) -> dict[str, Any]:
+    """
+    Set the margin and border multiplier of the size rules of a rules config
+
+    Args:
+        base_config (dict[str, Any]): rules config with at least one size rule
+        margin (float): relative margin within which sizes are considered similar
+        border_multiplier (float): relative width of the border of a single page in a double page scan
+
+    Raises:
+        ValueError: the config has no size rule
+
+    Returns:
+        dict[str, Any]: copy of the config with the new size parameters
+    """
+    config = copy.deepcopy(base_config)
+    size_rules = [rule for rule in config["rules"] if rule["type"] == "size"]
+    if not size_rules:
+        raise ValueError("The rules config must have a size rule to sweep its parameters")
+    for rule in size_rules:
+        rule["margin"] = margin
+        rule["border_multiplier"] = border_multiplier
+    return config
+
+
+def evaluate_rules(
+    rules: SeparationRules,
+    page_tables: Mapping[str, PageTable],
+    ground_truth: Mapping[str, Sequence[int]],
+) -> dict[str, Any]:
+    """
+    Separate all inventory numbers of the ground truth from their page tables and score the document starts
+
+    Args:
+        rules (SeparationRules): separation rules
+        page_tables (Mapping[str, PageTable]): cached names and sizes per inventory number
+        ground_truth (Mapping[str, Sequence[int]]): first page number of each document per inventory number
+
+    Returns:
+        dict[str, Any]: boundary counts, scores, number of pages and the time it took to separate and score
+    """
+    start = time.perf_counter()
+    true_positives = false_positives = false_negatives = pages = 0
+    for inventory_number, true_starts in ground_truth.items():
+        page_table = page_tables[inventory_number]
+        starts, page_numbers = rules.evaluate(page_table)
+        counts = get_boundary_counts(page_numbers[starts].tolist(), true_starts)
+        true_positives += counts[0]
+        false_positives += counts[1]
+        false_negatives += counts[2]
+        pages += len(page_table)
+    seconds = time.perf_counter() - start
+
+    return {
+        "true_positives": true_positives,
+        "false_positives": false_positives,
+        "false_negatives": false_negatives,
+        **get_scores(true_positives, false_positives, false_negatives),
+        "pages": pages,
+        "seconds": seconds,
+        "pages_per_second": pages / seconds if seconds > 0 else float(np.inf),
+    }
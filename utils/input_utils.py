@@ -1,12 +1,23 @@
 import os
 from pathlib import Path
-from typing import Container, Sequence
+from typing import Container, Iterator, Sequence
 
 from natsort import natsorted
-from PIL import Image
 
-Image.init()
-supported_image_formats = set(Image.EXTENSION.keys())
+from utils.pipeline_utils import ordered_map
+
+# Extensions of all formats Pillow can open (Image.EXTENSION after Image.init()), kept static so listing does not
+# have to import and initialise Pillow and its plugins
+supported_image_formats = frozenset(
+    {
+        ".apng", ".avif", ".avifs", ".blp", ".bmp", ".bufr", ".bw", ".cur", ".dcx", ".dds", ".dib", ".emf", ".eps",
+        ".fit", ".fits", ".flc", ".fli", ".ftc", ".ftu", ".gbr", ".gif", ".grib", ".h5", ".hdf", ".icb", ".icns",
+        ".ico", ".iim", ".im", ".j2c", ".j2k", ".jfif", ".jp2", ".jpc", ".jpe", ".jpeg", ".jpf", ".jpg", ".jpx",
+        ".mpeg", ".mpg", ".mpo", ".msp", ".palm", ".pbm", ".pcd", ".pcx", ".pdf", ".pfm", ".pgm", ".png", ".pnm",
+        ".ppm", ".ps", ".psd", ".pxr", ".qoi", ".ras", ".rgb", ".rgba", ".sgi", ".tga", ".tif", ".tiff", ".vda",
+        ".vst", ".webp", ".wmf", ".xbm", ".xpm",
+    }
+)  # fmt: skip
 
 
 def is_path_supported_format(path: Path, formats: Container[str]) -> bool:
@@ -23,6 +34,56 @@ def is_path_supported_format(path: Path, formats: Container[str]) -> bool:
     return path.suffix.lower() in formats
 
 
+def scan_inventory_dirs(input_dir: str | Path) -> list[Path]:
+    """
+    List the inventory dirs directly inside an input dir, using the file type information of the dir listing
+
+    Args:
+        input_dir (str | Path): dir containing one dir per inventory number
+
+    Returns:
+        list[Path]: inventory dirs, in the order of the dir listing
+    """
+    input_dir = Path(input_dir)
+    with os.scandir(input_dir) as entries:
+        return [input_dir.joinpath(entry.name) for entry in entries if entry.is_dir()]
+
+
+def scan_image_names(input_dir: str | Path, formats: Container[str]) -> list[str]:
+    """
+    List the names of the supported files in a dir, without creating a Path or doing a syscall per file
+
+    Args:
+        input_dir (str | Path): dir to list
+        formats (Container[str]): All supported formats in lowercase
+
+    Returns:
+        list[str]: natsorted file names, in the same order as get_file_paths would return them
+    """
+    with os.scandir(input_dir) as entries:
+        names = [entry.name for entry in entries if os.path.splitext(entry.name)[1].lower() in formats and entry.is_file()]
+    return natsorted(names)
+
+
+def count_image_files(input_dir: str | Path, formats: Container[str]) -> int:
+    """
+    Count the supported files in a dir, without building or sorting a list of names
+
+    Args:
+        input_dir (str | Path): dir to count
+        formats (Container[str]): All supported formats in lowercase
+
+    Returns:
+        int: number of supported files, the same as the length of scan_image_names
+    """
+    count = 0
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1].lower() in formats and entry.is_file():
+                count += 1
+    return count
+
+
 def clean_input_paths(
     input_paths: str | Path | Sequence[str | Path],
 ) -> list[Path]:
@@ -61,10 +122,104 @@ def clean_input_paths(
     return output
 
 
+def normalize_listed_path(path: str) -> str:
+    """
+    Normalize a path from a txt file the same way Path does, without creating a Path for the common case
+
+    Args:
+        path (str): path as listed
+
+    Returns:
+        str: the same string as str(Path(path))
+    """
+    if not path or "//" in path or "/." in path or path.startswith("./") or path.endswith("/") or path == ".":
+        return str(Path(path))
+    return path
+
+
+def check_listed_dir(dir_path: str, names: Sequence[str]) -> list[str]:
+    """
+    Find which of the listed names are not files in a dir, listing the dir once instead of checking each name
+
+    Args:
+        dir_path (str): dir the names are listed in
+        names (Sequence[str]): file names in the dir
+
+    Returns:
+        list[str]: names that are missing or not a file, in the listed order
+    """
+    try:
+        with os.scandir(dir_path or ".") as entries:
+            files = {entry.name for entry in entries if entry.is_file()}
+    except (FileNotFoundError, NotADirectoryError):
+        return list(names)
+    except PermissionError:
+        # A dir can be searchable without being readable, fall back to a check per file
+        return [name for name in names if not os.path.isfile(os.path.join(dir_path, name))]
+    return [name for name in names if name not in files]
+
+
+def resolve_listed_paths(
+    txt_path: str | Path,
+    formats: Container[str],
+    disable_check: bool = False,
+    workers: int = 8,
+) -> Iterator[str]:
+    """
+    Read the supported paths listed in a txt file, checking that they exist with one listing per dir
+
+    The listed paths are grouped by their dir, and the dirs are checked on a pool of threads. The paths of each dir
+    are yielded once its check is done, in the order the dirs are first listed.
+
+    Args:
+        txt_path (str | Path): txt file with one path per line, relative paths are relative to the txt file
+        formats (Container[str]): list of accepted file formats (extensions)
+        disable_check (bool, optional): Do not check if the listed files exist. Defaults to False.
+        workers (int, optional): number of dirs to check in parallel. Defaults to 8.
+
+    Raises:
+        FileNotFoundError: file from txt file does not exist
+
+    Yields:
+        Iterator[str]: paths of the listed files
+    """
+    txt_path = Path(txt_path)
+    parent = str(txt_path.parent)
+
+    # Group by the dir as listed, so the dir is only joined with the parent of the txt file once
+    listed_dirs: dict[str, list[str]] = {}
+    with txt_path.open(mode="r") as f:
+        for line in f.read().splitlines():
+            path = normalize_listed_path(line)
+            listed_dir, _, name = path.rpartition("/")
+            if not listed_dir and path.startswith("/"):
+                listed_dir = "/"
+            if os.path.splitext(name)[1].lower() in formats:
+                listed_dirs.setdefault(listed_dir, []).append(name)
+
+    dirs = [(os.path.join(parent, listed_dir), names) for listed_dir, names in listed_dirs.items()]
+    del listed_dirs
+
+    if disable_check:
+        for dir_path, names in dirs:
+            prefix = os.path.join(dir_path, "")
+            for name in names:
+                yield prefix + name
+        return
+
+    for (dir_path, names), missing in ordered_map(check_listed_dir, dirs, workers=workers):
+        prefix = os.path.join(dir_path, "")
+        if missing:
+            raise FileNotFoundError(f"Missing file ({prefix + missing[0]}) from the txt file: {txt_path}")
+        for name in names:
+            yield prefix + name
+
+
 def get_file_paths(
     input_paths: str | Path | Sequence[str | Path],
     formats: Container[str],
     disable_check: bool = False,
+    workers: int = 8,
 ) -> list[Path]:
     """
     Takes input paths, that may point to txt files containing more input paths and extracts them
@@ -73,6 +228,7 @@ def get_file_paths(
         input_paths (str | Path | Sequence[str | Path]): input path that have not been formatted
         formats (Container[str]): list of accepted file formats (extensions)
         disable_check (bool, optional): Run a check to see if all extracted files exist. Defaults to False.
+        workers (int, optional): number of dirs from a txt file to check in parallel. Defaults to 8.
 
     Raises:
         TypeError: input_paths is not set
@@ -108,32 +264,27 @@ def get_file_paths(
         # IDEA This could be replaces with input_path.rglob(f"**/page/*.xml"), con: this remove the supported format check
         if input_path.is_dir():
             sub_output_paths = [
-                image_path.absolute() for image_path in input_path.glob("*") if is_path_supported_format(image_path, formats)
+                str(image_path.absolute())
+                for image_path in input_path.glob("*")
+                if is_path_supported_format(image_path, formats)
             ]
 
             if len(sub_output_paths) == 0:
                 raise FileNotFoundError(f"No files found in the provided dir(s)/file(s) {input_path}")
 
         elif input_path.is_file() and is_path_supported_format(input_path, formats):
-            sub_output_paths = [input_path.absolute()]
+            sub_output_paths = [str(input_path.absolute())]
 
         elif input_path.is_file() and input_path.suffix == ".txt":
-            with input_path.open(mode="r") as f:
-                paths_from_file = [Path(line) for line in f.read().splitlines()]
-            sub_output_paths = [path if path.is_absolute() else input_path.parent.joinpath(path) for path in paths_from_file]
-            sub_output_paths = [path for path in sub_output_paths if is_path_supported_format(path, formats)]
+            sub_output_paths = list(resolve_listed_paths(input_path, formats, disable_check=disable_check, workers=workers))
 
             if len(sub_output_paths) == 0:
                 raise FileNotFoundError(f"No files found in the provided dir(s)/file(s) {input_path}")
 
-            if not disable_check:
-                for path in sub_output_paths:
-                    if not path.is_file():
-                        raise FileNotFoundError(f"Missing file ({path}) from the txt file: {input_path}")
-
         else:
             raise ValueError(f"Invalid file type {input_path}: {input_path.suffix}")
 
         output_paths.extend(sub_output_paths)
 
-    return natsorted(output_paths)
+    # Sorting the strings is faster than sorting the Path objects, which natsort converts to strings for every key
+    return [Path(path) for path in natsorted(output_paths)]
@@ -0,0 +1,132 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Mapping, Optional, Sequence
+
+from utils.manifest_utils import serialize_documents
+
+
+class Journal:
+    """
+    Checkpoints of the inventory numbers completed by a run, stored in a SQLite file, so an interrupted run can resume
+    """
+
+    def __init__(
+        self,
+        journal_path: str | Path,
+        fingerprint: dict[str, Any],
+        resume: bool = False,
+        checkpoint_interval: int = 100,
+    ) -> None:
+        """
+        Checkpoints of the inventory numbers completed by a run, stored in a SQLite file, so an interrupted run can resume
+
+        Args:
+            journal_path (str | Path): path to the SQLite journal file
+            fingerprint (dict[str, Any]): arguments that must be the same to resume a run
+            resume (bool, optional): Flag to keep the checkpoints of the previous run. Defaults to False.
+            checkpoint_interval (int, optional): number of completed inventory numbers after which the journal is committed. Defaults to 100.
+
+        Raises:
+            ValueError: the journal was written by a run with different arguments
+        """
+        journal_path = Path(journal_path)
+        journal_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.journal_path = journal_path
+        self.checkpoint_interval = checkpoint_interval
+        self.lock = threading.Lock()
+        self.pending = 0
+
+        self.connection = sqlite3.connect(journal_path, check_same_thread=False)
+        if not resume:
+            self.connection.execute("DROP TABLE IF EXISTS meta")
+            self.connection.execute("DROP TABLE IF EXISTS inventories")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS inventories (
+                inventory_number TEXT PRIMARY KEY,
+                entry TEXT NOT NULL,
+                documents TEXT NOT NULL,
+                changed INTEGER NOT NULL
+            )
+            """
+        )
+
+        fingerprint_json = json.dumps(fingerprint, sort_keys=True)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is None:
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('fingerprint', ?)", (fingerprint_json,))
+        elif row[0] != fingerprint_json:
+            self.connection.close()
+            raise ValueError(f"Journal {journal_path} was written by a run with different arguments: {row[0]}")
+        self.connection.commit()
+
+        self.resumed = self.connection.execute("SELECT COUNT(*) FROM inventories").fetchone()[0]
+
+    def get(self, inventory_number: str) -> Optional[dict[str, Any]]:
+        """
+        Get the checkpoint of a completed inventory number
+
+        Args:
+            inventory_number (str): inventory number
+
+        Returns:
+            Optional[dict[str, Any]]: manifest "entry", serialized "documents" and if the inventory "changed", None if not completed
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT entry, documents, changed FROM inventories WHERE inventory_number = ?", (inventory_number,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"entry": json.loads(row[0]), "documents": json.loads(row[1]), "changed": bool(row[2])}
+
+    def add(
+        self,
+        inventory_number: str,
+        entry: dict[str, Any],
+        documents: Mapping[str, Mapping[str, Sequence]],
+        changed: bool,
+    ) -> None:
+        """
+        Add a checkpoint for a completed inventory number, commit the journal every checkpoint_interval inventory numbers
+
+        Args:
+            inventory_number (str): inventory number
+            entry (dict[str, Any]): manifest entry, the serialized documents of the entry are not stored twice
+            documents (Mapping[str, Mapping[str, Sequence]]): documents with the page "numbers", "sizes" and "paths"
+            changed (bool): if the inventory changed since the manifest of the previous run
+        """
+        entry = {key: value for key, value in entry.items() if key != "documents"}
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO inventories (inventory_number, entry, documents, changed) VALUES (?, ?, ?, ?)",
+                (inventory_number, json.dumps(entry), json.dumps(serialize_documents(documents)), int(changed)),
+            )
+            self.pending += 1
+            if self.pending >= self.checkpoint_interval:
+                self.connection.commit()
+                self.pending = 0
+
+    def close(self, delete: bool = False) -> None:
+        """
+        Commit the remaining checkpoints and close the journal
+
+        Args:
+            delete (bool, optional): Flag to delete the journal, once the run is complete. Defaults to False.
+        """
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+        if delete:
+            self.journal_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Keep the checkpoints if the run failed, so it can be resumed
+        self.close(delete=exc_type is None)
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Container, Iterable, Mapping, Optional, Sequence
+
+from utils.input_utils import scan_image_names
+from utils.separation_utils import SeparatedInventory
+
+
+def get_listing_hash(inventory_dir: str | Path, formats: Container[str]) -> str:
+    """
+    Hash the names of all supported files in a dir, to detect files being added, removed or renamed
+
+    Args:
+        inventory_dir (str | Path): dir to list
+        formats (Container[str]): All supported formats in lowercase
+
+    Returns:
+        str: hex digest of the natsorted file names
+    """
+    return get_names_hash(scan_image_names(inventory_dir, formats))
+
+
+def get_names_hash(names: Sequence[str]) -> str:
+    """
+    Hash a listing of file names
+
+    Args:
+        names (Sequence[str]): natsorted file names
+
+    Returns:
+        str: hex digest of the file names
+    """
+    return hashlib.sha1("\n".join(names).encode("utf-8")).hexdigest()
+
+
+def serialize_documents(documents: Mapping[str, Mapping[str, Sequence]]) -> dict[str, dict[str, list]]:
+    """
+    Convert the separated documents of an inventory number to a JSON serializable dict
+
+    Args:
+        documents (Mapping[str, Mapping[str, Sequence]]): documents with the page "numbers", "sizes" and "paths"
+
+    Returns:
+        dict[str, dict[str, list]]: documents with the sizes as lists and the paths as str
+    """
+    return {
+        document_name: {
+            "numbers": list(document["numbers"]),
+            "sizes": [list(size) for size in document["sizes"]],
+            "paths": [str(path) for path in document["paths"]],
+        }
+        for document_name, document in documents.items()
+    }
+
+
+def deserialize_documents(inventory_dir: str | Path, data: dict[str, dict[str, list]]) -> SeparatedInventory:
+    """
+    Convert the serialized documents of an inventory number back to the format used during separation
+
+    Args:
+        inventory_dir (str | Path): dir containing the scans of the inventory number
+        data (dict[str, dict[str, list]]): serialized documents
+
+    Returns:
+        SeparatedInventory: compact separation result
+    """
+    return SeparatedInventory.from_documents(inventory_dir, data)
+
+
+class Manifest:
+    """
+    Separation result and file listing per inventory number of the previous run, stored in a SQLite file
+
+    All changes of a run are made in a single transaction, that is only committed when the manifest is closed without
+    an error, so an interrupted run leaves the manifest of the previous run intact.
+    """
+
+    def __init__(self, manifest_path: str | Path) -> None:
+        """
+        Separation result and file listing per inventory number of the previous run, stored in a SQLite file
+
+        Args:
+            manifest_path (str | Path): path to the SQLite manifest file
+        """
+        manifest_path = Path(manifest_path)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.manifest_path = manifest_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(manifest_path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS inventories (
+                inventory_number TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                listing_hash TEXT NOT NULL,
+                documents TEXT NOT NULL,
+                seen INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self.connection.commit()
+
+        self.output = self._get_meta("output")
+        self.output_mode = self._get_meta("output_mode")
+        self.copy_mode = self._get_meta("copy_mode")
+        settings = self._get_meta("settings")
+        self.settings = {} if settings is None else json.loads(settings)
+
+        # Start the transaction of this run, inventory numbers that are not seen again have been removed
+        self.connection.execute("UPDATE inventories SET seen = 0")
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def get(self, inventory_number: str) -> Optional[dict[str, Any]]:
+        """
+        Get the entry of an inventory number from the previous run
+
+        Args:
+            inventory_number (str): inventory number
+
+        Returns:
+            Optional[dict[str, Any]]: "path", "mtime_ns", "listing_hash" and serialized "documents", None if missing
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT path, mtime_ns, listing_hash, documents FROM inventories WHERE inventory_number = ?",
+                (inventory_number,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"path": row[0], "mtime_ns": row[1], "listing_hash": row[2], "documents": json.loads(row[3])}
+
+    def put(self, inventory_number: str, entry: dict[str, Any]) -> None:
+        """
+        Store the entry of an inventory number and mark it as seen in this run
+
+        Args:
+            inventory_number (str): inventory number
+            entry (dict[str, Any]): "path", "mtime_ns", "listing_hash" and serialized "documents"
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO inventories (inventory_number, path, mtime_ns, listing_hash, documents, seen) "
+                "VALUES (?, ?, ?, ?, ?, 1)",
+                (inventory_number, entry["path"], entry["mtime_ns"], entry["listing_hash"], json.dumps(entry["documents"])),
+            )
+
+    def keep(self, inventory_number: str, mtime_ns: int) -> None:
+        """
+        Keep the entry of an unchanged inventory number and mark it as seen in this run
+
+        Args:
+            inventory_number (str): inventory number
+            mtime_ns (int): current modification time of the inventory dir
+        """
+        with self.lock:
+            self.connection.execute(
+                "UPDATE inventories SET mtime_ns = ?, seen = 1 WHERE inventory_number = ?", (mtime_ns, inventory_number)
+            )
+
+    def get_unseen(self) -> list[str]:
+        """
+        Get the inventory numbers of the previous run that were not seen in this run
+
+        Returns:
+            list[str]: inventory numbers
+        """
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT inventory_number FROM inventories WHERE seen = 0")]
+
+    def remove(self, inventory_numbers: Iterable[str]) -> None:
+        """
+        Remove the entries of inventory numbers
+
+        Args:
+            inventory_numbers (Iterable[str]): inventory numbers
+        """
+        with self.lock:
+            self.connection.executemany(
+                "DELETE FROM inventories WHERE inventory_number = ?", ((inventory_number,) for inventory_number in inventory_numbers)
+            )
+
+    def set_output(self, output: Optional[str], output_mode: Optional[str], copy_mode: Optional[str] = None) -> None:
+        """
+        Store the output of this run
+
+        Args:
+            output (Optional[str]): resolved output path, None if there was no output
+            output_mode (Optional[str]): output mode, None if there was no output
+            copy_mode (Optional[str], optional): how the scans were materialised for the dirs output mode. Defaults to None.
+        """
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (("output", output), ("output_mode", output_mode), ("copy_mode", copy_mode)),
+            )
+
+    def set_settings(self, settings: dict[str, Any]) -> None:
+        """
+        Store the separation settings of this run, entries are only reused by a run with the same settings
+
+        Args:
+            settings (dict[str, Any]): separation settings, empty for the default settings
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('settings', ?)", (json.dumps(settings, sort_keys=True),)
+            )
+
+    def close(self, commit: bool = True) -> None:
+        """
+        Close the manifest
+
+        Args:
+            commit (bool, optional): Flag to commit the changes of this run, roll them back otherwise. Defaults to True.
+        """
+        with self.lock:
+            if commit:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+            self.connection.close()
+
+    def __enter__(self) -> "Manifest":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close(commit=exc_type is None)
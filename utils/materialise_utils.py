@@ -0,0 +1,132 @@
+import os
+import shutil
+import uuid
+from collections import Counter
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Mapping, Sequence
+
+from utils.copy_utils import atomic_copy_mode, is_materialised
+
+
+def remove_tree(path: str | Path) -> None:
+    """
+    Remove a dir tree, moving it out of the way first so it disappears at once instead of file by file
+
+    Args:
+        path (str | Path): dir to remove
+    """
+    path = Path(path)
+    stale_path = path.parent.joinpath(f".{path.name}.{uuid.uuid4().hex[:8]}.stale")
+    os.replace(path, stale_path)
+    shutil.rmtree(stale_path)
+
+
+def scan_tree(inventory_number_dir: Path) -> tuple[dict[str, set[str]], list[str]]:
+    """
+    List the document dirs of an inventory number in the output, and the files in them
+
+    Args:
+        inventory_number_dir (Path): output dir of the inventory number
+
+    Returns:
+        tuple[dict[str, set[str]], list[str]]: file names per document dir, and the names of other entries in the
+            inventory dir
+    """
+    document_dirs = {}
+    other_names = []
+    with os.scandir(inventory_number_dir) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                with os.scandir(entry.path) as document_entries:
+                    document_dirs[entry.name] = {document_entry.name for document_entry in document_entries}
+            else:
+                other_names.append(entry.name)
+    return document_dirs, other_names
+
+
+def materialise_inventory(
+    inventory_number_dir: Path,
+    documents: Mapping[str, Sequence[Path]],
+    executor: Executor,
+    mode: str = "copy",
+) -> Counter:
+    """
+    Bring the output dir of an inventory number in line with its documents, only applying the difference
+
+    Files that are already materialised with the same mode are kept, files that moved to another document are moved
+    with os.replace, and missing or outdated files are materialised at a temporary path and moved into place. New
+    document dirs are filled under a temporary name and renamed when complete. Everything that is not part of the
+    documents, such as stale document dirs and leftovers of an interrupted run, is removed afterwards.
+
+    Args:
+        inventory_number_dir (Path): output dir of the inventory number
+        documents (Mapping[str, Sequence[Path]]): paths of the scans per document name
+        executor (Executor): pool to materialise the files with
+        mode (str, optional): given mode "symlink", "link", "reflink" or "copy". Defaults to "copy".
+
+    Returns:
+        Counter: number of "kept", "moved", "created" and "removed" files, and of "removed_dirs"
+    """
+    counts = Counter()
+    inventory_number_dir.mkdir(parents=True, exist_ok=True)
+    existing_dirs, other_names = scan_tree(inventory_number_dir)
+
+    # File names are unique within an inventory number, so a file can be found back in any document dir
+    existing_locations = {}
+    for document_name, file_names in existing_dirs.items():
+        for file_name in file_names:
+            existing_locations[file_name] = document_name
+
+    renames = []
+    image_paths = []
+    destinations = []
+    for document_name, paths in documents.items():
+        if document_name in existing_dirs:
+            document_dir = inventory_number_dir.joinpath(document_name)
+        else:
+            document_dir = inventory_number_dir.joinpath(f".{document_name}.{uuid.uuid4().hex[:8]}.tmp")
+            document_dir.mkdir()
+            renames.append((document_dir, inventory_number_dir.joinpath(document_name)))
+
+        for image_path in paths:
+            file_name = image_path.name
+            destination = document_dir.joinpath(file_name)
+            existing_document_name = existing_locations.get(file_name)
+            if existing_document_name is not None:
+                existing_path = inventory_number_dir.joinpath(existing_document_name, file_name)
+                if is_materialised(image_path, existing_path, mode):
+                    existing_dirs[existing_document_name].discard(file_name)
+                    if existing_path == destination:
+                        counts["kept"] += 1
+                    else:
+                        os.replace(existing_path, destination)
+                        counts["moved"] += 1
+                    continue
+            image_paths.append(image_path)
+            destinations.append(destination)
+
+    # Consume the results to raise any errors before the new document dirs are moved into place
+    for _ in executor.map(atomic_copy_mode, image_paths, destinations, [mode] * len(image_paths)):
+        counts["created"] += 1
+
+    for temporary_dir, document_dir in renames:
+        os.rename(temporary_dir, document_dir)
+
+    for document_name, file_names in existing_dirs.items():
+        document_dir = inventory_number_dir.joinpath(document_name)
+        if document_name not in documents:
+            counts["removed"] += len(file_names)
+            counts["removed_dirs"] += 1
+            remove_tree(document_dir)
+            continue
+        # Outdated files were replaced in place, only remove the files that are not part of the document anymore
+        for file_name in file_names.difference(path.name for path in documents[document_name]):
+            os.remove(document_dir.joinpath(file_name))
+            counts["removed"] += 1
+
+    for name in other_names:
+        os.remove(inventory_number_dir.joinpath(name))
+        counts["removed"] += 1
+
+    return counts
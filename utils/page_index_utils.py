@@ -0,0 +1,355 @@
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from utils.copy_utils import get_temporary_path
+from utils.separation_utils import SeparatedInventory
+
+# File layout, all integers little endian:
+#   header        PAGE_INDEX_HEADER
+#   pages         PAGE_DTYPE records, the pages of each inventory number consecutive and in page order
+#   inventories   INVENTORY_DTYPE records, in the order the inventory numbers were added
+#   order         uint32 indices of the inventories, sorted by inventory number
+#   strings       utf-8 string table with the inventory numbers, inventory dirs and file names
+PAGE_INDEX_MAGIC = b"SEPINDEX"
+PAGE_INDEX_VERSION = 1
+PAGE_INDEX_HEADER = struct.Struct("<8sII7Q")
+
+PAGE_DTYPE = np.dtype(
+    [
+        ("inventory", "<u4"),
+        ("page_number", "<i4"),
+        ("document", "<u4"),
+        ("width", "<i4"),
+        ("height", "<i4"),
+        ("path_length", "<u4"),
+        ("path_offset", "<u8"),
+    ]
+)
+INVENTORY_DTYPE = np.dtype(
+    [
+        ("name_offset", "<u8"),
+        ("dir_offset", "<u8"),
+        ("first_page", "<u8"),
+        ("name_length", "<u4"),
+        ("dir_length", "<u4"),
+        ("pages", "<u4"),
+        ("documents", "<u4"),
+    ]
+)
+
+
+class PageIndexWriter:
+    """
+    Write the separation ground truth to a page index file that can be memory-mapped, one inventory number at a time
+    """
+
+    def __init__(self, output_path: str | Path) -> None:
+        """
+        Write the separation ground truth to a page index file that can be memory-mapped, one inventory number at a time
+
+        The page records are written to a temporary file next to the output and the string table to an anonymous
+        temporary file. The file is only moved into place when it is saved, so a reader never sees a partial index.
+
+        Args:
+            output_path (str | Path): path to the page index file
+        """
+        self.output_path = Path(output_path)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.temporary_path = get_temporary_path(self.output_path)
+        self.file = open(self.temporary_path, mode="wb")
+        self.file.write(bytes(PAGE_INDEX_HEADER.size))
+        self.strings_file = tempfile.TemporaryFile(dir=self.output_path.parent)
+        self.strings_size = 0
+
+        self.inventory_numbers: dict[bytes, int] = {}
+        self.inventories = []
+        self.number_of_pages = 0
+        self.saved = False
+
+    def add_string(self, value: bytes) -> int:
+        """
+        Append a string to the string table
+
+        Args:
+            value (bytes): utf-8 encoded string
+
+        Returns:
+            int: offset of the string in the string table
+        """
+        offset = self.strings_size
+        self.strings_file.write(value)
+        self.strings_size += len(value)
+        return offset
+
+    def add_inventory(self, inventory_number: str, documents: SeparatedInventory) -> None:
+        """
+        Write the pages of all documents of an inventory number
+
+        Args:
+            inventory_number (str): inventory number
+            documents (SeparatedInventory): separation result of the inventory number
+
+        Raises:
+            ValueError: the inventory number was already added
+        """
+        name = inventory_number.encode()
+        if name in self.inventory_numbers:
+            raise ValueError(f"Duplicate inventory number: {inventory_number}")
+        self.inventory_numbers[name] = len(self.inventories)
+
+        directory = str(documents.inventory_dir).encode()
+        number_of_pages = documents.number_of_pages
+        self.inventories.append(
+            (
+                self.add_string(name),
+                self.add_string(directory),
+                self.number_of_pages,
+                len(name),
+                len(directory),
+                number_of_pages,
+                len(documents),
+            )
+        )
+
+        file_names = [file_name.encode() for file_name in documents.get_names(0, number_of_pages)]
+        path_lengths = np.fromiter(map(len, file_names), dtype=np.uint64, count=number_of_pages)
+
+        records = np.empty(number_of_pages, dtype=PAGE_DTYPE)
+        records["inventory"] = len(self.inventories) - 1
+        records["page_number"] = documents.page_numbers
+        records["document"] = np.repeat(np.arange(len(documents)), documents.document_lengths())
+        records["width"] = documents.widths
+        records["height"] = documents.heights
+        records["path_length"] = path_lengths
+        records["path_offset"] = np.cumsum(path_lengths) - path_lengths + self.strings_size
+        self.add_string(b"".join(file_names))
+
+        self.file.write(records.tobytes())
+        self.number_of_pages += number_of_pages
+
+    def save(self) -> None:
+        """
+        Write the inventory table, the sort order and the string table, and move the page index into place
+        """
+        pages_offset = PAGE_INDEX_HEADER.size
+        inventories_offset = pages_offset + self.number_of_pages * PAGE_DTYPE.itemsize
+        order_offset = inventories_offset + len(self.inventories) * INVENTORY_DTYPE.itemsize
+        strings_offset = order_offset + len(self.inventories) * 4
+
+        self.file.write(np.array(self.inventories, dtype=INVENTORY_DTYPE).tobytes())
+        order = [self.inventory_numbers[name] for name in sorted(self.inventory_numbers)]
+        self.file.write(np.array(order, dtype="<u4").tobytes())
+        self.strings_file.seek(0)
+        shutil.copyfileobj(self.strings_file, self.file)
+        self.strings_file.close()
+
+        self.file.seek(0)
+        self.file.write(
+            PAGE_INDEX_HEADER.pack(
+                PAGE_INDEX_MAGIC,
+                PAGE_INDEX_VERSION,
+                0,
+                self.number_of_pages,
+                len(self.inventories),
+                pages_offset,
+                inventories_offset,
+                order_offset,
+                strings_offset,
+                self.strings_size,
+            )
+        )
+        self.file.close()
+        os.replace(self.temporary_path, self.output_path)
+        self.saved = True
+
+    def abort(self) -> None:
+        """
+        Close the files and remove the temporary page index if it was not saved, an existing index is left as it is
+        """
+        if self.saved:
+            return
+        self.file.close()
+        self.strings_file.close()
+        try:
+            os.remove(self.temporary_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "PageIndexWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.abort()
+
+
+class PageIndex:
+    """
+    Read-only view on a page index file, memory-mapped so lookups do not load the index
+    """
+
+    def __init__(self, index_path: str | Path) -> None:
+        """
+        Read-only view on a page index file, memory-mapped so lookups do not load the index
+
+        Lookups binary search the inventory numbers and the page numbers of one inventory number directly in the mapped
+        file. The pages are only read from disk when they are touched, and processes that open the same index share them
+        through the page cache.
+
+        Args:
+            index_path (str | Path): path to the page index file
+
+        Raises:
+            ValueError: the file is not a page index or was written by an other version
+        """
+        self.index_path = Path(index_path)
+        with self.index_path.open(mode="rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.mmap) < PAGE_INDEX_HEADER.size:
+            self.mmap.close()
+            raise ValueError(f"Invalid page index {index_path}: file is too small")
+        (
+            magic,
+            version,
+            _,
+            number_of_pages,
+            number_of_inventories,
+            pages_offset,
+            inventories_offset,
+            order_offset,
+            strings_offset,
+            _,
+        ) = PAGE_INDEX_HEADER.unpack_from(self.mmap, 0)
+        if magic != PAGE_INDEX_MAGIC or version != PAGE_INDEX_VERSION:
+            self.mmap.close()
+            raise ValueError(f"Invalid page index {index_path}: magic {magic!r}, version {version}")
+
+        self.pages = np.frombuffer(self.mmap, dtype=PAGE_DTYPE, count=number_of_pages, offset=pages_offset)
+        self.inventories = np.frombuffer(
+            self.mmap, dtype=INVENTORY_DTYPE, count=number_of_inventories, offset=inventories_offset
+        )
+        self.inventory_order = np.frombuffer(self.mmap, dtype="<u4", count=number_of_inventories, offset=order_offset)
+        self.strings_offset = strings_offset
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def get_string(self, offset: int, length: int) -> str:
+        """
+        Get a string from the string table
+
+        Args:
+            offset (int): offset in the string table
+            length (int): length in bytes
+
+        Returns:
+            str: decoded string
+        """
+        start = self.strings_offset + int(offset)
+        return self.mmap[start : start + int(length)].decode()
+
+    def get_inventory_number(self, inventory: int) -> str:
+        """
+        Get the inventory number of an inventory record
+
+        Args:
+            inventory (int): index of the inventory record
+
+        Returns:
+            str: inventory number
+        """
+        record = self.inventories[inventory]
+        return self.get_string(record["name_offset"], record["name_length"])
+
+    def find_inventory(self, inventory_number: str) -> Optional[int]:
+        """
+        Find the inventory record of an inventory number, with a binary search on the sorted inventory numbers
+
+        Args:
+            inventory_number (str): inventory number
+
+        Returns:
+            Optional[int]: index of the inventory record, None if the inventory number is not in the index
+        """
+        name = inventory_number.encode()
+        order = self.inventory_order
+
+        def get_name(i: int) -> bytes:
+            record = self.inventories[order[i]]
+            start = self.strings_offset + int(record["name_offset"])
+            return self.mmap[start : start + int(record["name_length"])]
+
+        i = bisect_left(range(len(order)), name, key=get_name)
+        if i < len(order) and get_name(i) == name:
+            return int(order[i])
+        return None
+
+    def get_pages(self, inventory_number: str, page_number: int) -> list[dict[str, Any]]:
+        """
+        Look up the scans with a page number in an inventory number, and the document they belong to
+
+        A page number can have more than one scan, when a page is continued on the next scan (deelopname).
+
+        Args:
+            inventory_number (str): inventory number
+            page_number (int): page number
+
+        Raises:
+            KeyError: the inventory number is not in the index
+
+        Returns:
+            list[dict[str, Any]]: per scan the "inventory_number", "page_number", "document" (the name of its first scan),
+            "document_start" (page number of its first scan), "width", "height" and "path", empty if there is no such page
+        """
+        inventory = self.find_inventory(inventory_number)
+        if inventory is None:
+            raise KeyError(inventory_number)
+        record = self.inventories[inventory]
+        first_page = int(record["first_page"])
+        pages = self.pages[first_page : first_page + int(record["pages"])]
+        directory = self.get_string(record["dir_offset"], record["dir_length"])
+
+        # Page numbers and documents are non-decreasing within an inventory number, so both can be binary searched
+        page_numbers = pages["page_number"]
+        documents = pages["document"]
+        start = bisect_left(page_numbers, page_number)
+        end = bisect_right(page_numbers, page_number, start)
+
+        results = []
+        for i in range(start, end):
+            page = pages[i]
+            document_start = pages[bisect_left(documents, page["document"], 0, i + 1)]
+            results.append(
+                {
+                    "inventory_number": inventory_number,
+                    "page_number": int(page["page_number"]),
+                    "document": self.get_string(document_start["path_offset"], document_start["path_length"]),
+                    "document_start": int(document_start["page_number"]),
+                    "width": int(page["width"]),
+                    "height": int(page["height"]),
+                    "path": os.path.join(directory, self.get_string(page["path_offset"], page["path_length"])),
+                }
+            )
+        return results
+
+    def close(self) -> None:
+        """
+        Release the views on the mapped file and unmap it
+        """
+        self.pages = self.inventories = self.inventory_order = None
+        self.mmap.close()
+
+    def __enter__(self) -> "PageIndex":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
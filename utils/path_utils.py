@@ -1,6 +1,10 @@
 import os
 import re
+import threading
 from pathlib import Path
+from typing import Container, Iterable, Iterator, Optional
+
+from natsort import natsorted
 
 from utils.input_utils import is_path_supported_format, supported_image_formats
 
@@ -77,9 +81,158 @@ def xml_path_to_image_path(xml_path: Path, check: bool = True) -> Path:
     return image_path
 
 
+class PairingIndex:
+    """
+    Index of the images in a dir and the PAGE-XML files in its page dir, both listed once, keyed by stem
+    """
+
+    def __init__(self, image_dir: str | Path, formats: Container[str] = supported_image_formats) -> None:
+        """
+        Index of the images in a dir and the PAGE-XML files in its page dir, both listed once, keyed by stem
+
+        Args:
+            image_dir (str | Path): dir containing the images, the PAGE-XML files are in its "page" subdir
+            formats (Container[str], optional): All supported formats in lowercase. Defaults to supported_image_formats.
+        """
+        self.image_dir = Path(image_dir).absolute()
+        self.xml_dir = self.image_dir.joinpath("page")
+
+        self.image_names: dict[str, list[str]] = {}
+        if self.image_dir.is_dir():
+            with os.scandir(self.image_dir) as entries:
+                for entry in entries:
+                    stem, suffix = os.path.splitext(entry.name)
+                    if suffix.lower() in formats and entry.is_file():
+                        self.image_names.setdefault(stem, []).append(entry.name)
+        # TODO multiple images with the same name (extract from pageXML what to use), for now the first natsorted name
+        for stem, names in self.image_names.items():
+            if len(names) > 1:
+                self.image_names[stem] = natsorted(names)
+
+        self.xml_names: dict[str, str] = {}
+        if self.xml_dir.is_dir():
+            with os.scandir(self.xml_dir) as entries:
+                for entry in entries:
+                    stem, suffix = os.path.splitext(entry.name)
+                    if suffix == ".xml" and entry.is_file():
+                        self.xml_names[stem] = entry.name
+
+        self.image_dir_readable = os.access(path=self.image_dir, mode=os.R_OK)
+        self.xml_dir_readable = os.access(path=self.xml_dir, mode=os.R_OK)
+
+    def get_image_path(self, stem: str) -> Optional[Path]:
+        """
+        Get the image with a given stem
+
+        Args:
+            stem (str): file name without extension
+
+        Returns:
+            Optional[Path]: image path, None if there is no image with this stem
+        """
+        names = self.image_names.get(stem)
+        if names is None:
+            return None
+        return self.image_dir.joinpath(names[0])
+
+    def get_xml_path(self, stem: str) -> Optional[Path]:
+        """
+        Get the PAGE-XML file with a given stem
+
+        Args:
+            stem (str): file name without extension
+
+        Returns:
+            Optional[Path]: xml path, None if there is no xml file with this stem
+        """
+        name = self.xml_names.get(stem)
+        if name is None:
+            return None
+        return self.xml_dir.joinpath(name)
+
+    def pairs(self) -> Iterator[tuple[Path, Optional[Path]]]:
+        """
+        Pair all images of the dir with their PAGE-XML file
+
+        Yields:
+            Iterator[tuple[Path, Optional[Path]]]: natsorted image paths and their xml path, None if missing
+        """
+        image_names = natsorted(name for names in self.image_names.values() for name in names)
+        for image_name in image_names:
+            yield self.image_dir.joinpath(image_name), self.get_xml_path(os.path.splitext(image_name)[0])
+
+
+def image_paths_to_xml_paths(image_paths: Iterable[Path], check: bool = True) -> list[Path]:
+    """
+    Return the corresponding xml paths for many images, listing every image dir and its page dir only once
+
+    Args:
+        image_paths (Iterable[Path]): Image paths
+        check (bool): Flag to turn off checking existence
+
+    Raises:
+        FileNotFoundError: Missing xml path
+        PermissionError: No read access for the page dir
+
+    Returns:
+        list[Path]: XML paths, in the same order as the image paths
+    """
+    indices: dict[Path, PairingIndex] = {}
+    xml_paths = []
+    for image_path in image_paths:
+        image_path = image_path.absolute()
+        index = indices.get(image_path.parent)
+        if index is None:
+            index = indices[image_path.parent] = PairingIndex(image_path.parent)
+
+        xml_path = index.get_xml_path(image_path.stem)
+        if xml_path is None:
+            if check:
+                raise FileNotFoundError(f"Missing path: {index.xml_dir.joinpath(image_path.stem + '.xml')}")
+            xml_path = index.xml_dir.joinpath(image_path.stem + ".xml")
+        elif check and not index.xml_dir_readable:
+            raise PermissionError(f"No access to {xml_path} for read operations")
+        xml_paths.append(xml_path)
+
+    return xml_paths
+
+
+def xml_paths_to_image_paths(xml_paths: Iterable[Path], check: bool = True) -> list[Path]:
+    """
+    Return the corresponding image paths for many xml files, listing every image dir and its page dir only once
+
+    Args:
+        xml_paths (Iterable[Path]): XML paths
+        check (bool): Flag to turn off checking existence
+
+    Raises:
+        FileNotFoundError: No image for xml path
+        PermissionError: No read access for the image dir
+
+    Returns:
+        list[Path]: Image paths, in the same order as the xml paths
+    """
+    indices: dict[Path, PairingIndex] = {}
+    image_paths = []
+    for xml_path in xml_paths:
+        image_dir = xml_path.absolute().parents[1]
+        index = indices.get(image_dir)
+        if index is None:
+            index = indices[image_dir] = PairingIndex(image_dir)
+
+        image_path = index.get_image_path(xml_path.stem)
+        if image_path is None:
+            raise FileNotFoundError(f"No image equivalent found for {xml_path}")
+        if check and not index.image_dir_readable:
+            raise PermissionError(f"No access to {image_path} for read operations")
+        image_paths.append(image_path)
+
+    return image_paths
+
+
 def unique_path(path: str | Path, current_count: int = 1) -> Path:
     """
-    Check if current path exists if it does recursively check if the next path with (n) added to the end already exists
+    Check if current path exists if it does check if the next path with (n) added to the end already exists
 
     Args:
         path (str | Path): base path
@@ -91,16 +244,63 @@ def unique_path(path: str | Path, current_count: int = 1) -> Path:
 
     if isinstance(path, str):
         path = Path(path)
-    if not path.exists():
-        return path
 
-    if match := re.fullmatch(r"(.*)(\(\d+\))", path.stem):
-        path_suggestion = Path(match.group(1) + f"({current_count})" + path.suffix)
-    else:
-        path_suggestion = Path(path.stem + f"({current_count})" + path.suffix)
+    while path.exists():
+        if match := re.fullmatch(r"(.*)(\(\d+\))", path.stem):
+            path_suggestion = Path(match.group(1) + f"({current_count})" + path.suffix)
+        else:
+            path_suggestion = Path(path.stem + f"({current_count})" + path.suffix)
+
+        path = path.parent.joinpath(path_suggestion)
+
+        current_count = current_count + 1
+
+    return path
+
+
+class UniquePathAllocator:
+    """
+    Hand out unique paths in a single dir, with the same (n) naming as unique_path, listing the dir only once
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        """
+        Hand out unique paths in a single dir, with the same (n) naming as unique_path, listing the dir only once
+
+        The dir is listed when the allocator is created, files created afterwards by others are not seen. Allocated
+        names are reserved, so parallel exporters sharing the allocator never get the same path.
+
+        Args:
+            directory (str | Path): dir to allocate paths in
+        """
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        self.used_names = set(os.listdir(self.directory)) if self.directory.is_dir() else set()
+        # Next (n) to try per base stem and suffix, every lower number is already used
+        self.next_counts: dict[tuple[str, str], int] = {}
+
+    def allocate(self, name: str) -> Path:
+        """
+        Reserve a unique path for a file name in the dir
 
-    path_suggestion = path.parent.joinpath(path_suggestion)
+        Args:
+            name (str): file name, used as is if it is not taken
 
-    current_count = current_count + 1
+        Returns:
+            Path: the path of the name in the dir, or of the first free name with (n) added to the end
+        """
+        with self.lock:
+            if name not in self.used_names:
+                self.used_names.add(name)
+                return self.directory.joinpath(name)
 
-    return unique_path(path_suggestion, current_count=current_count)
+            stem, suffix = os.path.splitext(name)
+            if match := re.fullmatch(r"(.*)(\(\d+\))", stem):
+                stem = match.group(1)
+            count = self.next_counts.get((stem, suffix), 1)
+            while f"{stem}({count}){suffix}" in self.used_names:
+                count += 1
+            unique_name = f"{stem}({count}){suffix}"
+            self.used_names.add(unique_name)
+            self.next_counts[(stem, suffix)] = count + 1
+            return self.directory.joinpath(unique_name)
@@ -0,0 +1,112 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+# Marks the end of the iterable on the queue of a feeder thread
+_END = object()
+
+
+def ordered_map(
+    function: Callable[..., Any],
+    iterable: Iterable[tuple],
+    workers: int = 1,
+    max_pending: Optional[int] = None,
+    blocking_input: bool = False,
+) -> Iterator[tuple[tuple, Any]]:
+    """
+    Apply a function to the arguments from an iterable with a pool of threads, yield the results in input order
+
+    Unlike Executor.map, the iterable is consumed lazily and at most max_pending calls are in flight, so neither the
+    input nor the results have to fit in memory.
+
+    Args:
+        function (Callable[..., Any]): function to call with each tuple of arguments
+        iterable (Iterable[tuple]): tuples of arguments
+        workers (int, optional): number of threads, the function is called in the current thread if 1. Defaults to 1.
+        max_pending (Optional[int], optional): maximum number of calls in flight. Defaults to twice the number of workers.
+        blocking_input (bool, optional): Flag to consume the iterable on a separate thread, so every result is yielded as
+            soon as it and the results before it are done, even while the iterable waits for more input, such as lines
+            from stdin. Defaults to False.
+
+    Yields:
+        Iterator[tuple[tuple, Any]]: arguments and result of each call
+    """
+    if workers <= 1:
+        for arguments in iterable:
+            yield arguments, function(*arguments)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * workers
+
+    if blocking_input:
+        yield from _ordered_map_fed(function, iterable, workers, max_pending)
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for arguments in iterable:
+                pending.append((arguments, executor.submit(function, *arguments)))
+                if len(pending) >= max_pending:
+                    arguments, future = pending.popleft()
+                    yield arguments, future.result()
+            while pending:
+                arguments, future = pending.popleft()
+                yield arguments, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _ordered_map_fed(
+    function: Callable[..., Any],
+    iterable: Iterable[tuple],
+    workers: int,
+    max_pending: int,
+) -> Iterator[tuple[tuple, Any]]:
+    # The feeder thread submits the calls as the arguments arrive, the current thread only waits for the results
+    submitted = queue.Queue()
+    slots = threading.Semaphore(max_pending)
+    stop = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def feed() -> None:
+            try:
+                for arguments in iterable:
+                    slots.acquire()
+                    if stop.is_set():
+                        return
+                    submitted.put((arguments, executor.submit(function, *arguments)))
+            except BaseException as e:
+                submitted.put(e)
+            finally:
+                submitted.put(_END)
+
+        # A daemon thread, a feeder blocked on its input must not keep the process alive
+        feeder = threading.Thread(target=feed, name="ordered-map-feeder", daemon=True)
+        feeder.start()
+        try:
+            while True:
+                item = submitted.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                arguments, future = item
+                result = future.result()
+                slots.release()
+                yield arguments, result
+        finally:
+            stop.set()
+            slots.release()
+            while True:
+                try:
+                    item = submitted.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, tuple):
+                    item[1].cancel()
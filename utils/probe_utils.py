@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+
+class AsyncImageSizeProber:
+    """
+    Read the image sizes of many files concurrently, from a single event loop shared by all inventory workers
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 64,
+        get_image_size: Optional[Callable[[str | Path], tuple[int, int]]] = None,
+    ) -> None:
+        """
+        Read the image sizes of many files concurrently, from a single event loop shared by all inventory workers
+
+        The standard library has no asynchronous file reads, so the header reads themselves run on a pool of
+        `concurrency` threads. The event loop multiplexes the requests of all inventories onto that pool, so the number
+        of reads in flight is set by the concurrency limit instead of by the number of inventory workers.
+
+        Args:
+            concurrency (int, optional): maximum number of header reads in flight. Defaults to 64.
+            get_image_size (Optional[Callable[[str | Path], tuple[int, int]]], optional): function to read the size of one image. Defaults to imagesize.get.
+        """
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1, got {concurrency}")
+        if get_image_size is None:
+            import imagesize
+
+            get_image_size = imagesize.get
+
+        self.get_image_size = get_image_size
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="probe")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="probe-loop", daemon=True)
+        self.thread.start()
+
+    async def _probe(self, image_paths: Sequence[str | Path]) -> list[tuple[int, int]]:
+        """
+        Schedule the header reads of all images at once, gather keeps the results in the order of the input
+
+        Args:
+            image_paths (Sequence[str | Path]): paths to the images
+
+        Returns:
+            list[tuple[int, int]]: width and height per image
+        """
+        return await asyncio.gather(
+            *(self.loop.run_in_executor(self.executor, self.get_image_size, image_path) for image_path in image_paths)
+        )
+
+    def probe(self, image_paths: Sequence[str | Path]) -> list[tuple[int, int]]:
+        """
+        Read the sizes of images, blocking the calling thread until all are read
+
+        Args:
+            image_paths (Sequence[str | Path]): paths to the images
+
+        Returns:
+            list[tuple[int, int]]: width and height per image, in the order of image_paths
+        """
+        return asyncio.run_coroutine_threadsafe(self._probe(image_paths), self.loop).result()
+
+    def close(self) -> None:
+        """
+        Stop the event loop and the header readers
+        """
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.executor.shutdown()
+
+    def __enter__(self) -> "AsyncImageSizeProber":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,183 @@
+import json
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Iterator, Optional
+
+
+def get_io_counters() -> Optional[dict[str, int]]:
+    """
+    Get the number of bytes read and written by this process so far, only available on Linux
+
+    Returns:
+        Optional[dict[str, int]]: "rchar" and "wchar" from /proc/self/io, None if not available
+    """
+    try:
+        with open("/proc/self/io", mode="r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return None
+    return {"rchar": int(counters["rchar"]), "wchar": int(counters["wchar"])}
+
+
+class StageProfiler:
+    """
+    Thread-safe timers per stage, counters and per inventory latencies of a run
+    """
+
+    def __init__(self) -> None:
+        """
+        Thread-safe timers per stage, counters and per inventory latencies of a run
+        """
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.start_io = get_io_counters()
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = Counter()
+        self.counters = Counter()
+        self.inventory_seconds = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time a stage, the time of multiple calls (also from different threads) is summed
+
+        Args:
+            name (str): name of the stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.stage_seconds[name] += seconds
+                self.stage_calls[name] += 1
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Increase a counter
+
+        Args:
+            name (str): name of the counter
+            value (int, optional): value to add. Defaults to 1.
+        """
+        with self.lock:
+            self.counters[name] += value
+
+    def record_inventory(self, inventory_number: str, seconds: float) -> None:
+        """
+        Record how long it took to process an inventory number
+
+        Args:
+            inventory_number (str): inventory number
+            seconds (float): processing time
+        """
+        with self.lock:
+            self.inventory_seconds[inventory_number] = seconds
+
+    def report(self) -> dict[str, Any]:
+        """
+        Summarize the run
+
+        Returns:
+            dict[str, Any]: wall time, stage timings, counters, images per second, IO and inventory latency statistics
+        """
+        wall_seconds = time.perf_counter() - self.start_time
+        with self.lock:
+            report = {
+                "wall_seconds": wall_seconds,
+                "stages": {
+                    name: {"seconds": seconds, "calls": self.stage_calls[name]} for name, seconds in self.stage_seconds.items()
+                },
+                "counters": dict(self.counters),
+                "images_per_second": self.counters["images"] / wall_seconds if wall_seconds else None,
+            }
+            latencies = sorted(self.inventory_seconds.items(), key=lambda item: item[1])
+
+        end_io = get_io_counters()
+        if self.start_io is not None and end_io is not None:
+            report["io"] = {
+                "bytes_read": end_io["rchar"] - self.start_io["rchar"],
+                "bytes_written": end_io["wchar"] - self.start_io["wchar"],
+            }
+
+        if latencies:
+            seconds = [latency for _, latency in latencies]
+            # Buckets of powers of two milliseconds, labeled with their upper bound
+            histogram = Counter(2 ** max(0, math.ceil(math.log2(max(latency * 1000, 1e-9)))) for latency in seconds)
+            report["inventory_latency"] = {
+                "count": len(seconds),
+                "mean_seconds": sum(seconds) / len(seconds),
+                "p50_seconds": seconds[int(0.5 * (len(seconds) - 1))],
+                "p90_seconds": seconds[int(0.9 * (len(seconds) - 1))],
+                "p99_seconds": seconds[int(0.99 * (len(seconds) - 1))],
+                "max_seconds": seconds[-1],
+                "histogram_ms": {f"<={bucket}": histogram[bucket] for bucket in sorted(histogram)},
+                "slowest": [{"inventory_number": name, "seconds": latency} for name, latency in reversed(latencies[-10:])],
+            }
+
+        return report
+
+    def save(self, output_path: str | Path) -> None:
+        """
+        Write the report to a json file
+
+        Args:
+            output_path (str | Path): path to the json file
+        """
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with output_path.open(mode="w") as f:
+            json.dump(self.report(), f, indent=4)
+
+
+def profile_stage(profiler: Optional[StageProfiler], name: str) -> ContextManager:
+    """
+    Time a stage if there is a profiler, do nothing otherwise
+
+    Args:
+        profiler (Optional[StageProfiler]): profiler to record the stage in
+        name (str): name of the stage
+
+    Returns:
+        ContextManager: context to run the stage in
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name)
+
+
+@contextmanager
+def profile_run(report_path: Optional[str | Path] = None, cprofile_path: Optional[str | Path] = None) -> Iterator[StageProfiler]:
+    """
+    Profile a run, write the json report and the cProfile stats (of the main thread) when the run ends
+
+    Args:
+        report_path (Optional[str | Path], optional): path to write the json report to. Defaults to None.
+        cprofile_path (Optional[str | Path], optional): path to dump the cProfile stats to. Defaults to None.
+
+    Yields:
+        Iterator[StageProfiler]: profiler to record the run in
+    """
+    profiler = StageProfiler()
+
+    cprofile = None
+    if cprofile_path is not None:
+        import cProfile
+
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+
+    try:
+        yield profiler
+    finally:
+        if cprofile is not None:
+            cprofile.disable()
+            Path(cprofile_path).parent.mkdir(parents=True, exist_ok=True)
+            cprofile.dump_stats(cprofile_path)
+        if report_path is not None:
+            profiler.save(report_path)
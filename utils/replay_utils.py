@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Container, Iterator
+
+import numpy as np
+from natsort import natsorted
+
+from utils.csv_utils import read_separation_csv
+from utils.manifest_utils import deserialize_documents
+from utils.rule_utils import PageTable
+from utils.separation_utils import SeparatedInventory
+
+
+def get_page_table(documents: SeparatedInventory) -> PageTable:
+    """
+    Get the page table of a separated inventory number
+
+    Args:
+        documents (SeparatedInventory): separation result of the inventory number
+
+    Returns:
+        PageTable: names and sizes of its scans
+    """
+    names = documents.get_names(0, documents.number_of_pages)
+    sizes = np.column_stack((np.asarray(documents.widths), np.asarray(documents.heights)))
+    return PageTable(names, sizes)
+
+
+def read_page_tables_csv(input_path: str | Path) -> Iterator[tuple[str, Path, PageTable]]:
+    """
+    Read the page tables of all inventory numbers from a separation csv file, without touching the scans
+
+    Args:
+        input_path (str | Path): path to the csv file written with --output-mode csv
+
+    Yields:
+        Iterator[tuple[str, Path, PageTable]]: inventory number, inventory dir and the names and sizes of its scans
+    """
+    for inventory_number, documents in read_separation_csv(input_path):
+        yield inventory_number, documents.inventory_dir, get_page_table(documents)
+
+
+def is_manifest(sqlite_path: str | Path) -> bool:
+    """
+    Check if a SQLite file is a manifest (--manifest) rather than an image size cache (--size-cache)
+
+    Args:
+        sqlite_path (str | Path): path to the SQLite file
+
+    Returns:
+        bool: True if the file has the inventories table of a manifest
+    """
+    connection = sqlite3.connect(f"file:{Path(sqlite_path).absolute()}?mode=ro", uri=True)
+    try:
+        row = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'inventories'").fetchone()
+    finally:
+        connection.close()
+    return row is not None
+
+
+def read_page_tables_manifest(manifest_path: str | Path) -> Iterator[tuple[str, Path, PageTable]]:
+    """
+    Read the page tables of all inventory numbers from a manifest, without touching the scans
+
+    The manifest holds the exact listing and sizes of each inventory number as it was separated in the last run, so
+    unlike a size cache it does not include scans that were removed or renamed before that run. Inventory numbers are
+    yielded in natsorted order of their dir.
+
+    Args:
+        manifest_path (str | Path): path to the SQLite manifest file written with --manifest
+
+    Yields:
+        Iterator[tuple[str, Path, PageTable]]: inventory number, inventory dir and the names and sizes of its scans
+    """
+    connection = sqlite3.connect(f"file:{Path(manifest_path).absolute()}?mode=ro", uri=True)
+    try:
+        inventories = connection.execute("SELECT inventory_number, path FROM inventories").fetchall()
+        for inventory_number, inventory_dir in natsorted(inventories, key=lambda inventory: inventory[1]):
+            (data,) = connection.execute(
+                "SELECT documents FROM inventories WHERE inventory_number = ?", (inventory_number,)
+            ).fetchone()
+            documents = deserialize_documents(inventory_dir, json.loads(data))
+            yield inventory_number, Path(inventory_dir), get_page_table(documents)
+    finally:
+        connection.close()
+
+
+def read_page_tables_size_cache(cache_path: str | Path, formats: Container[str]) -> Iterator[tuple[str, Path, PageTable]]:
+    """
+    Read the page tables of all inventory numbers from an image size cache, without touching the scans
+
+    The cache holds every image that was ever probed, so scans removed or renamed since are still included, use
+    read_page_tables_manifest when a manifest of the run is available. Inventory numbers are yielded in natsorted
+    order of their dir.
+
+    Args:
+        cache_path (str | Path): path to the SQLite cache file written with --size-cache
+        formats (Container[str]): All supported formats in lowercase
+
+    Yields:
+        Iterator[tuple[str, Path, PageTable]]: inventory number, inventory dir and the names and sizes of its scans
+    """
+    inventories: dict[str, dict[str, tuple[int, int]]] = {}
+    connection = sqlite3.connect(f"file:{Path(cache_path).absolute()}?mode=ro", uri=True)
+    try:
+        for image_path, width, height in connection.execute("SELECT path, width, height FROM image_sizes"):
+            inventory_dir, name = os.path.split(image_path)
+            if os.path.splitext(name)[1].lower() in formats:
+                inventories.setdefault(inventory_dir, {})[name] = (width, height)
+    finally:
+        connection.close()
+
+    for inventory_dir in natsorted(inventories):
+        sizes = inventories.pop(inventory_dir)
+        names = natsorted(sizes)
+        yield os.path.basename(inventory_dir), Path(inventory_dir), PageTable(names, [sizes[name] for name in names])
@@ -0,0 +1,284 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from utils.separation_utils import get_size_matches
+
+DEFAULT_RULES_CONFIG = {
+    "rules": [
+        # check if ends in deelopname1, deelopname2, etc.
+        {"type": "continue_pattern", "pattern": r".*deelopname\d+$"},
+        {"type": "size", "margin": 0.1, "border_multiplier": 0.01},
+    ]
+}
+
+
+class PageTable:
+    """
+    Page order, file names, sizes and optional content features of the scans of one inventory number
+    """
+
+    __slots__ = ("names", "stems", "sizes", "content_features")
+
+    def __init__(
+        self, names: Sequence[str], sizes: np.ndarray | Sequence, content_features: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Page order, file names, sizes and optional content features of the scans of one inventory number
+
+        Args:
+            names (Sequence[str]): file names in page order
+            sizes (np.ndarray | Sequence): (N, 2) width and height per scan
+            content_features (Optional[np.ndarray], optional): (N, F) content features per scan. Defaults to None.
+        """
+        self.names = names
+        self.stems = [os.path.splitext(name)[0] for name in names]
+        self.sizes = np.asarray(sizes, dtype=np.int64).reshape(-1, 2)
+        self.content_features = content_features
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class PatternRule:
+    """
+    Mark the scans whose file name without extension matches a pattern, the pattern is compiled once
+    """
+
+    def __init__(self, pattern: str) -> None:
+        """
+        Mark the scans whose file name without extension matches a pattern, the pattern is compiled once
+
+        Args:
+            pattern (str): regular expression, matched from the start of the file name without extension
+        """
+        self.pattern = re.compile(pattern)
+
+    def get_mask(self, page_table: PageTable) -> np.ndarray:
+        """
+        Match the pattern against all scans of an inventory number
+
+        Args:
+            page_table (PageTable): scans of one inventory number
+
+        Returns:
+            np.ndarray: (N,) boolean array, True if the file name matches
+        """
+        match = self.pattern.match
+        return np.fromiter((match(stem) is not None for stem in page_table.stems), dtype=bool, count=len(page_table))
+
+    def to_config(self) -> dict[str, Any]:
+        return {"type": self.config_type, "pattern": self.pattern.pattern}
+
+
+class ContinuePatternRule(PatternRule):
+    """
+    Scans matching the pattern always belong to the current document and share the page number of the scan before them
+    """
+
+    config_type = "continue_pattern"
+
+
+class StartPatternRule(PatternRule):
+    """
+    Scans matching the pattern always start a document, unless they are continued by a continue rule
+    """
+
+    config_type = "start_pattern"
+
+
+class SizeRule:
+    """
+    A scan starts a document if its size does not match the previous scan, allowing for half and double width scans
+    """
+
+    config_type = "size"
+
+    def __init__(self, margin: float = 0.1, border_multiplier: float = 0.01) -> None:
+        """
+        A scan starts a document if its size does not match the previous scan, allowing for half and double width scans
+
+        Args:
+            margin (float, optional): relative margin within which sizes are considered similar. Defaults to 0.1.
+            border_multiplier (float, optional): relative width of the border of a single page in a double page scan. Defaults to 0.01.
+        """
+        self.margin = margin
+        self.border_multiplier = border_multiplier
+
+    def get_breaks(self, page_table: PageTable, regular_indices: np.ndarray) -> np.ndarray:
+        """
+        Compare every regular scan to the previous regular scan
+
+        Args:
+            page_table (PageTable): scans of one inventory number
+            regular_indices (np.ndarray): indices of the scans that are not continued
+
+        Returns:
+            np.ndarray: (R - 1,) boolean array, True if the regular scan starts a document
+        """
+        regular_sizes = page_table.sizes[regular_indices]
+        return ~get_size_matches(regular_sizes[:-1], regular_sizes[1:], self.margin, self.border_multiplier)
+
+    def to_config(self) -> dict[str, Any]:
+        return {"type": self.config_type, "margin": self.margin, "border_multiplier": self.border_multiplier}
+
+
+class ContentRule:
+    """
+    A scan starts a document if its content differs too much from the previous scan
+    """
+
+    config_type = "content"
+
+    def __init__(self, threshold: float = 0.5) -> None:
+        """
+        A scan starts a document if its content differs too much from the previous scan
+
+        Args:
+            threshold (float, optional): content distance above which a scan starts a document. Defaults to 0.5.
+        """
+        self.threshold = threshold
+
+    def get_breaks(self, page_table: PageTable, regular_indices: np.ndarray) -> np.ndarray:
+        """
+        Compare the content features of every regular scan to those of the previous regular scan
+
+        Args:
+            page_table (PageTable): scans of one inventory number, with content features
+            regular_indices (np.ndarray): indices of the scans that are not continued
+
+        Raises:
+            ValueError: the page table has no content features
+
+        Returns:
+            np.ndarray: (R - 1,) boolean array, True if the regular scan starts a document
+        """
+        if page_table.content_features is None:
+            raise ValueError("The content rule requires content features")
+        regular_features = np.asarray(page_table.content_features)[regular_indices]
+        return np.abs(regular_features[1:] - regular_features[:-1]).mean(axis=1) > self.threshold
+
+    def to_config(self) -> dict[str, Any]:
+        return {"type": self.config_type, "threshold": self.threshold}
+
+
+RULE_TYPES = {rule.config_type: rule for rule in (ContinuePatternRule, StartPatternRule, SizeRule, ContentRule)}
+
+
+class SeparationRules:
+    """
+    List of separation rules, evaluated over the page table of a whole inventory number in one pass
+    """
+
+    def __init__(self, rules: Sequence[Any]) -> None:
+        """
+        List of separation rules, evaluated over the page table of a whole inventory number in one pass
+
+        Args:
+            rules (Sequence[Any]): continue and start pattern rules, and boundary rules comparing consecutive scans
+        """
+        self.rules = list(rules)
+        self.continue_rules = [rule for rule in self.rules if isinstance(rule, ContinuePatternRule)]
+        self.start_rules = [rule for rule in self.rules if isinstance(rule, StartPatternRule)]
+        self.boundary_rules = [rule for rule in self.rules if hasattr(rule, "get_breaks")]
+
+    def add(self, rule: Any) -> None:
+        """
+        Add a rule after the existing rules
+
+        Args:
+            rule (Any): continue or start pattern rule, or boundary rule comparing consecutive scans
+        """
+        self.rules.append(rule)
+        if isinstance(rule, ContinuePatternRule):
+            self.continue_rules.append(rule)
+        elif isinstance(rule, StartPatternRule):
+            self.start_rules.append(rule)
+        else:
+            self.boundary_rules.append(rule)
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "SeparationRules":
+        """
+        Create the rules from a config, such as DEFAULT_RULES_CONFIG
+
+        Args:
+            config (dict[str, Any]): config with a list of "rules", each with a "type" and the arguments of that rule
+
+        Raises:
+            ValueError: rule type is not supported
+
+        Returns:
+            SeparationRules: compiled rules
+        """
+        rules = []
+        for rule_config in config["rules"]:
+            rule_config = dict(rule_config)
+            rule_type = rule_config.pop("type")
+            if rule_type not in RULE_TYPES:
+                raise ValueError(f"Rule type must be one of {list(RULE_TYPES)}, got {rule_type}")
+            rules.append(RULE_TYPES[rule_type](**rule_config))
+        return cls(rules)
+
+    @classmethod
+    def from_file(cls, config_path: Optional[str | Path] = None) -> "SeparationRules":
+        """
+        Load the rules from a json config file
+
+        Args:
+            config_path (Optional[str | Path], optional): path to the json config. Defaults to DEFAULT_RULES_CONFIG.
+
+        Returns:
+            SeparationRules: compiled rules
+        """
+        if config_path is None:
+            return cls.from_config(DEFAULT_RULES_CONFIG)
+        with Path(config_path).open(mode="r") as f:
+            return cls.from_config(json.load(f))
+
+    def to_config(self) -> dict[str, Any]:
+        return {"rules": [rule.to_config() for rule in self.rules]}
+
+    @property
+    def requires_content(self) -> bool:
+        return any(isinstance(rule, ContentRule) for rule in self.rules)
+
+    def evaluate(self, page_table: PageTable) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the document boundaries and page numbers of all scans of an inventory number
+
+        Continued scans belong to the current document and share the page number of the scan before them. All other
+        scans are compared to the previous scan that is not continued, the first scan always starts a document.
+
+        Args:
+            page_table (PageTable): scans of one inventory number
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (N,) boolean array, True if the scan starts a document, and (N,) array of page numbers
+        """
+        if len(page_table) == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+
+        continue_mask = np.zeros(len(page_table), dtype=bool)
+        for rule in self.continue_rules:
+            continue_mask |= rule.get_mask(page_table)
+        regular_mask = ~continue_mask
+        regular_mask[0] = True
+        regular_indices = np.flatnonzero(regular_mask)
+
+        regular_starts = np.zeros(len(regular_indices), dtype=bool)
+        regular_starts[0] = True
+        for rule in self.boundary_rules:
+            regular_starts[1:] |= rule.get_breaks(page_table, regular_indices)
+
+        starts = np.zeros(len(page_table), dtype=bool)
+        starts[regular_indices] = regular_starts
+        for rule in self.start_rules:
+            starts |= rule.get_mask(page_table) & regular_mask
+        page_numbers = np.cumsum(regular_mask)
+
+        return starts, page_numbers
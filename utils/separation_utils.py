@@ -0,0 +1,206 @@
+import itertools
+import os
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+
+
+def get_size_matches(
+    image_sizes1: np.ndarray,
+    image_sizes2: np.ndarray,
+    margin: float,
+    border_multiplier: float = 0.01,
+) -> np.ndarray:
+    """
+    Vectorised version of get_size_match, check for pairs of image sizes if they could belong to the same document
+
+    Args:
+        image_sizes1 (np.ndarray): (N, 2) array of the width and height of the previous images
+        image_sizes2 (np.ndarray): (N, 2) array of the width and height of the current images
+        margin (float): relative margin within which sizes are considered similar
+        border_multiplier (float, optional): relative width of the border of a single page in a double page scan. Defaults to 0.01.
+
+    Returns:
+        np.ndarray: (N,) boolean array, True if the sizes are similar, or if one is about half or double the width of the other
+    """
+    min_multiplier = 1.0 - margin
+    max_multiplier = 1.0 + margin
+    image1_width = image_sizes1[:, 0]
+    image2_width = image_sizes2[:, 0]
+    image1_height = image_sizes1[:, 1]
+    image2_height = image_sizes2[:, 1]
+
+    # Same order of operations as get_size_match, so the floating point results are identical
+    similar_height = (image1_height * min_multiplier < image2_height) & (image2_height < image1_height * max_multiplier)
+    similar_width = (image1_width * min_multiplier < image2_width) & (image2_width < image1_width * max_multiplier)
+    similar_half_width = (image1_width * (1 - border_multiplier) * min_multiplier < image2_width / 2) & (
+        image2_width / 2 < image1_width * (1 - border_multiplier) * max_multiplier
+    )
+    similar_double_width = (image1_width * min_multiplier < image2_width * (2 - border_multiplier)) & (
+        image2_width * (2 - border_multiplier) < image1_width * max_multiplier
+    )
+
+    return similar_height & (similar_width | similar_half_width | similar_double_width)
+
+
+class SeparatedDocument(Mapping):
+    """
+    View on the pages of one document of a SeparatedInventory, with the page "numbers", "sizes" and "paths"
+    """
+
+    __slots__ = ("inventory", "start", "end")
+
+    def __init__(self, inventory: "SeparatedInventory", start: int, end: int) -> None:
+        """
+        View on the pages of one document of a SeparatedInventory, with the page "numbers", "sizes" and "paths"
+
+        Args:
+            inventory (SeparatedInventory): inventory the document belongs to
+            start (int): index of the first page of the document
+            end (int): index after the last page of the document
+        """
+        self.inventory = inventory
+        self.start = start
+        self.end = end
+
+    def __getitem__(self, key: str) -> Sequence:
+        if key == "numbers":
+            return self.inventory.page_numbers[self.start : self.end]
+        if key == "sizes":
+            return list(zip(self.inventory.widths[self.start : self.end], self.inventory.heights[self.start : self.end]))
+        if key == "paths":
+            return [self.inventory.inventory_dir.joinpath(name) for name in self.inventory.get_names(self.start, self.end)]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("numbers", "sizes", "paths"))
+
+    def __len__(self) -> int:
+        return 3
+
+
+class SeparatedInventory(Mapping):
+    """
+    Compact separation result of one inventory number, a mapping from document name to SeparatedDocument
+
+    Page numbers and sizes are stored in arrays and documents as offsets of their first page. The file names, relative to
+    the inventory dir, are stored in a single string table with an array of offsets. Paths are only created when a
+    document is accessed.
+    """
+
+    def __init__(
+        self,
+        inventory_dir: str | Path,
+        names: Sequence[str],
+        page_numbers: Sequence[int],
+        widths: Sequence[int],
+        heights: Sequence[int],
+        document_starts: Sequence[int],
+    ) -> None:
+        """
+        Compact separation result of one inventory number, a mapping from document name to SeparatedDocument
+
+        Args:
+            inventory_dir (str | Path): dir containing the scans of the inventory number
+            names (Sequence[str]): file names relative to the inventory dir, in page order
+            page_numbers (Sequence[int]): page number per scan
+            widths (Sequence[int]): width per scan
+            heights (Sequence[int]): height per scan
+            document_starts (Sequence[int]): index of the first scan of each document, in increasing order
+        """
+        if not len(names) == len(page_numbers) == len(widths) == len(heights):
+            raise ValueError("Names, page numbers, widths and heights must have the same length")
+
+        self.inventory_dir = Path(inventory_dir)
+        self.name_table = "".join(names)
+        self.name_offsets = array("q", [0])
+        self.name_offsets.extend(itertools.accumulate(len(name) for name in names))
+        self.page_numbers = array("i", page_numbers)
+        self.widths = array("i", widths)
+        self.heights = array("i", heights)
+        self.document_starts = array("i", document_starts)
+        self._document_indices = None
+
+    @classmethod
+    def from_documents(cls, inventory_dir: str | Path, documents: Mapping[str, Mapping[str, Sequence]]) -> "SeparatedInventory":
+        """
+        Create a compact separation result from documents with the page "numbers", "sizes" and "paths"
+
+        Args:
+            inventory_dir (str | Path): dir containing the scans of the inventory number
+            documents (Mapping[str, Mapping[str, Sequence]]): documents keyed by the name of their first scan
+
+        Returns:
+            SeparatedInventory: compact separation result
+        """
+        names = []
+        page_numbers = []
+        widths = []
+        heights = []
+        document_starts = []
+        for document in documents.values():
+            document_starts.append(len(names))
+            names.extend(os.path.relpath(path, inventory_dir) for path in document["paths"])
+            page_numbers.extend(document["numbers"])
+            widths.extend(size[0] for size in document["sizes"])
+            heights.extend(size[1] for size in document["sizes"])
+        return cls(inventory_dir, names, page_numbers, widths, heights, document_starts)
+
+    @property
+    def number_of_pages(self) -> int:
+        return len(self.page_numbers)
+
+    def get_name(self, index: int) -> str:
+        """
+        Get the file name of a scan
+
+        Args:
+            index (int): index of the scan
+
+        Returns:
+            str: file name relative to the inventory dir
+        """
+        return self.name_table[self.name_offsets[index] : self.name_offsets[index + 1]]
+
+    def get_names(self, start: int, end: int) -> list[str]:
+        """
+        Get the file names of a range of scans
+
+        Args:
+            start (int): index of the first scan
+            end (int): index after the last scan
+
+        Returns:
+            list[str]: file names relative to the inventory dir
+        """
+        offsets = self.name_offsets[start : end + 1]
+        return [self.name_table[name_start:name_end] for name_start, name_end in zip(offsets[:-1], offsets[1:])]
+
+    def _document_bounds(self, index: int) -> tuple[int, int]:
+        start = self.document_starts[index]
+        end = self.document_starts[index + 1] if index + 1 < len(self.document_starts) else self.number_of_pages
+        return start, end
+
+    def __getitem__(self, document_name: str) -> SeparatedDocument:
+        if self._document_indices is None:
+            self._document_indices = {self.get_name(start): index for index, start in enumerate(self.document_starts)}
+        return SeparatedDocument(self, *self._document_bounds(self._document_indices[document_name]))
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.get_name(start) for start in self.document_starts)
+
+    def __len__(self) -> int:
+        return len(self.document_starts)
+
+    def document_lengths(self) -> list[int]:
+        """
+        Number of pages per document, without creating document views
+
+        Returns:
+            list[int]: number of scans per document
+        """
+        bounds = list(self.document_starts) + [self.number_of_pages]
+        return [end - start for start, end in zip(bounds[:-1], bounds[1:])]
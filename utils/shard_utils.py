@@ -0,0 +1,38 @@
+import zlib
+
+
+def parse_shard(shard: str) -> tuple[int, int]:
+    """
+    Parse a shard given as "i/N", to be used as an argparse type
+
+    Args:
+        shard (str): shard index and number of shards, the index is zero based
+
+    Raises:
+        ValueError: shard is not formatted as "i/N" or the index is out of range
+
+    Returns:
+        tuple[int, int]: shard index and number of shards
+    """
+    try:
+        index, total = (int(value) for value in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be given as i/N, got {shard}")
+    if total < 1 or not 0 <= index < total:
+        raise ValueError(f"Shard index must be in [0, {total}), got {shard}")
+    return index, total
+
+
+def in_shard(inventory_number: str, shard: tuple[int, int]) -> bool:
+    """
+    Check if an inventory number belongs to a shard, based on a hash that is stable between processes and machines
+
+    Args:
+        inventory_number (str): inventory number
+        shard (tuple[int, int]): shard index and number of shards
+
+    Returns:
+        bool: True if the inventory number belongs to the shard, False otherwise
+    """
+    index, total = shard
+    return zlib.crc32(inventory_number.encode("utf-8")) % total == index
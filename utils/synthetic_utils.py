@@ -0,0 +1,92 @@
+import random
+import struct
+import zlib
+from pathlib import Path
+from typing import Sequence
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_header(width: int, height: int) -> bytes:
+    """
+    Create the signature and IHDR chunk of a PNG, enough for imagesize to read the size without any pixel data
+
+    Args:
+        width (int): image width
+        height (int): image height
+
+    Returns:
+        bytes: PNG header
+    """
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    chunk = b"IHDR" + ihdr
+    return PNG_SIGNATURE + struct.pack(">I", len(ihdr)) + chunk + struct.pack(">I", zlib.crc32(chunk))
+
+
+def generate_synthetic_archive(
+    output_dir: str | Path,
+    inventories: int,
+    pages_per_inventory: tuple[int, int],
+    document_length: tuple[int, int],
+    sizes: Sequence[tuple[int, int]],
+    deelopname_rate: float = 0.02,
+    double_width_rate: float = 0.05,
+    half_width_rate: float = 0.05,
+    seed: int = 0,
+) -> int:
+    """
+    Write an archive of inventory dirs with tiny PNG headers, mimicking the size patterns of real scans
+
+    Each document gets a random paper size, within a document scans are occasionally double width (spreads) or half
+    width, and are occasionally followed by a deelopname (partial scan).
+
+    Args:
+        output_dir (str | Path): dir to write the inventory dirs to
+        inventories (int): number of inventory dirs
+        pages_per_inventory (tuple[int, int]): minimum and maximum number of pages per inventory
+        document_length (tuple[int, int]): minimum and maximum number of pages per document
+        sizes (Sequence[tuple[int, int]]): paper sizes (width, height) to pick from per document
+        deelopname_rate (float, optional): chance of a deelopname after a page. Defaults to 0.02.
+        double_width_rate (float, optional): chance of a page being a double width spread. Defaults to 0.05.
+        half_width_rate (float, optional): chance of a page being half width. Defaults to 0.05.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        int: total number of files written
+    """
+    rng = random.Random(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    total = 0
+    for inventory in range(inventories):
+        inventory_number = f"{inventory + 1:07d}"
+        inventory_dir = output_dir.joinpath(inventory_number)
+        inventory_dir.mkdir(exist_ok=True)
+
+        number_of_pages = rng.randint(*pages_per_inventory)
+        remaining_document_pages = 0
+        width, height = sizes[0]
+        for page in range(1, number_of_pages + 1):
+            if remaining_document_pages == 0:
+                remaining_document_pages = rng.randint(*document_length)
+                width, height = rng.choice(sizes)
+            remaining_document_pages -= 1
+
+            page_width = width
+            chance = rng.random()
+            if chance < double_width_rate:
+                page_width = width * 2
+            elif chance < double_width_rate + half_width_rate:
+                page_width = width // 2
+
+            stem = f"NL-HaNA_{inventory_number}_{page:04d}"
+            inventory_dir.joinpath(f"{stem}.png").write_bytes(png_header(page_width, height))
+            total += 1
+
+            if rng.random() < deelopname_rate:
+                deelopname_size = (rng.randint(1, width), rng.randint(1, height))
+                inventory_dir.joinpath(f"{stem}_deelopname1.png").write_bytes(png_header(*deelopname_size))
+                total += 1
+
+    return total
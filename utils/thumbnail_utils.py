@@ -0,0 +1,253 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Features are scaled so the mean absolute difference between two feature vectors is a distance in [0, 1]
+CONTENT_SIGNALS = ("dhash", "histogram")
+DEFAULT_CONTENT_THRESHOLDS = {"dhash": 0.4, "histogram": 0.5}
+
+DHASH_SIZE = (9, 8)
+HISTOGRAM_SIZE = (64, 64)
+HISTOGRAM_BINS = 16
+
+
+def get_thumbnail(image_path: str | Path, size: tuple[int, int]) -> "Image.Image":
+    """
+    Load a grayscale thumbnail of an image, without decoding the full resolution if the format allows it
+
+    For JPEG, draft lets the decoder scale the DCT coefficients down by up to a factor 8, the remaining reduction is
+    done by resize, which uses reduce for the integer part of the scale factor.
+
+    Args:
+        image_path (str | Path): path to the image
+        size (tuple[int, int]): width and height of the thumbnail
+
+    Returns:
+        Image.Image: grayscale thumbnail
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        image.draft("L", (size[0] * 4, size[1] * 4))
+        image = image.convert("L")
+    return image.resize(size, Image.Resampling.BOX, reducing_gap=2.0)
+
+
+def get_content_features(image_path: str | Path, signal: str) -> np.ndarray:
+    """
+    Compute the content features of an image from a thumbnail
+
+    Args:
+        image_path (str | Path): path to the image
+        signal (str): "dhash" for the 64 bits of a difference hash, "histogram" for a grayscale histogram
+
+    Raises:
+        ValueError: signal is not supported
+
+    Returns:
+        np.ndarray: features, the mean absolute difference between two of them is the normalised hamming distance for
+            "dhash" and the total variation distance for "histogram"
+    """
+    if signal == "dhash":
+        pixels = np.asarray(get_thumbnail(image_path, DHASH_SIZE), dtype=np.int16)
+        return (pixels[:, 1:] > pixels[:, :-1]).ravel().astype(np.float32)
+    if signal == "histogram":
+        pixels = np.asarray(get_thumbnail(image_path, HISTOGRAM_SIZE), dtype=np.uint8)
+        histogram = np.bincount((pixels >> 4).ravel(), minlength=HISTOGRAM_BINS).astype(np.float32)
+        return histogram * (HISTOGRAM_BINS / 2 / pixels.size)
+    raise ValueError(f"Content signal must be one of {CONTENT_SIGNALS}, got {signal}")
+
+
+class ThumbnailCache:
+    """
+    Persistent cache of content features, keyed by the path of the image and the signal, validated with the size and
+    modification time of the image
+    """
+
+    def __init__(self, cache_path: str | Path, rebuild: bool = False) -> None:
+        """
+        Persistent cache of content features, keyed by the path of the image and the signal, validated with the size and
+        modification time of the image
+
+        Args:
+            cache_path (str | Path): path to the SQLite cache file
+            rebuild (bool, optional): Flag to drop all existing entries. Defaults to False.
+        """
+        cache_path = Path(cache_path)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        if rebuild:
+            self.connection.execute("DROP TABLE IF EXISTS content_features")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS content_features (
+                path TEXT NOT NULL,
+                signal TEXT NOT NULL,
+                st_size INTEGER NOT NULL,
+                st_mtime_ns INTEGER NOT NULL,
+                features BLOB NOT NULL,
+                PRIMARY KEY (path, signal)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def get_many(self, image_paths: Sequence[str], signal: str) -> tuple[list[Optional[np.ndarray]], list[os.stat_result]]:
+        """
+        Get the cached features of a batch of images
+
+        Args:
+            image_paths (Sequence[str]): paths to the images
+            signal (str): content signal
+
+        Returns:
+            tuple[list[Optional[np.ndarray]], list[os.stat_result]]: features per image, None if missing or stale, and
+                the stat of each image to store new features with
+        """
+        stats = [os.stat(image_path) for image_path in image_paths]
+        features = []
+        with self.lock:
+            for image_path, stat in zip(image_paths, stats):
+                row = self.connection.execute(
+                    "SELECT st_size, st_mtime_ns, features FROM content_features WHERE path = ? AND signal = ?",
+                    (image_path, signal),
+                ).fetchone()
+                if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                    self.hits += 1
+                    features.append(np.frombuffer(row[2], dtype=np.float32))
+                else:
+                    self.misses += 1
+                    features.append(None)
+        return features, stats
+
+    def put_many(
+        self, image_paths: Sequence[str], signal: str, stats: Sequence[os.stat_result], features: Sequence[np.ndarray]
+    ) -> None:
+        """
+        Store the features of a batch of images and commit them
+
+        Args:
+            image_paths (Sequence[str]): paths to the images
+            signal (str): content signal
+            stats (Sequence[os.stat_result]): stat of each image, from before the features were computed
+            features (Sequence[np.ndarray]): features per image
+        """
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO content_features (path, signal, st_size, st_mtime_ns, features) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (image_path, signal, stat.st_size, stat.st_mtime_ns, image_features.astype(np.float32).tobytes())
+                    for image_path, stat, image_features in zip(image_paths, stats, features)
+                ),
+            )
+            self.connection.commit()
+
+    def close(self) -> None:
+        """
+        Close the cache
+        """
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+    def __enter__(self) -> "ThumbnailCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class ContentFeatureExtractor:
+    """
+    Compute the content features of the scans of an inventory number in batches, on a pool of processes shared by all
+    inventory workers
+    """
+
+    def __init__(
+        self,
+        signal: str,
+        processes: Optional[int] = None,
+        cache: Optional[ThumbnailCache] = None,
+        chunksize: int = 16,
+    ) -> None:
+        """
+        Compute the content features of the scans of an inventory number in batches, on a pool of processes shared by
+        all inventory workers
+
+        Args:
+            signal (str): "dhash" or "histogram"
+            processes (Optional[int], optional): number of processes decoding thumbnails. Defaults to the number of CPUs.
+            cache (Optional[ThumbnailCache], optional): cache to get the features from. Defaults to None.
+            chunksize (int, optional): number of images sent to a process at once. Defaults to 16.
+
+        Raises:
+            ValueError: signal is not supported
+        """
+        if signal not in CONTENT_SIGNALS:
+            raise ValueError(f"Content signal must be one of {CONTENT_SIGNALS}, got {signal}")
+
+        self.signal = signal
+        self.cache = cache
+        self.chunksize = chunksize
+        # Spawn instead of fork, the processes are started from inventory worker threads
+        self.executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+
+    def get_features(self, image_paths: Sequence[str]) -> np.ndarray:
+        """
+        Get the content features of a batch of images, only decoding the images that are not cached
+
+        Args:
+            image_paths (Sequence[str]): paths to the images
+
+        Returns:
+            np.ndarray: (N, F) array of features, in the order of image_paths
+        """
+        if self.cache is None:
+            features = [None] * len(image_paths)
+        else:
+            features, stats = self.cache.get_many(image_paths, self.signal)
+
+        missing = [index for index, image_features in enumerate(features) if image_features is None]
+        missing_paths = [image_paths[index] for index in missing]
+        computed = list(
+            self.executor.map(partial(get_content_features, signal=self.signal), missing_paths, chunksize=self.chunksize)
+        )
+        for index, image_features in zip(missing, computed):
+            features[index] = image_features
+
+        if self.cache is not None and missing:
+            self.cache.put_many(missing_paths, self.signal, [stats[index] for index in missing], computed)
+
+        if len(features) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(features)
+
+    def close(self) -> None:
+        """
+        Stop the pool of processes
+        """
+        self.executor.shutdown()
+
+    def __enter__(self) -> "ContentFeatureExtractor":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,178 @@
+import os
+from pathlib import Path
+from typing import Iterator, Mapping, Sequence
+
+from utils.copy_utils import get_temporary_path
+
+SPINQUE_DOSSIER_URL = "https://cloud.spinque.com/oorlogvoorderechter/explore/dossier"
+
+MAIN_TITLES = ("Inventory number", "Dossier link", "Number of documents")
+INVENTORY_TITLES = ("Start of document", "Scan name", "Number of pages", "Page numbers")
+
+
+class XLSXSeparationWriter:
+    """
+    Write the separation ground truth to an xlsx file one inventory number at a time, using a write-only workbook
+    """
+
+    def __init__(self, output_path: str | Path) -> None:
+        """
+        Write the separation ground truth to an xlsx file one inventory number at a time, using a write-only workbook
+
+        The sheets are written to temporary files by openpyxl, the xlsx file is only written when it is saved.
+
+        Args:
+            output_path (str | Path): path to the xlsx file
+        """
+        # openpyxl is only imported when an xlsx file is written, it takes longer to import than the rest of the tools
+        from openpyxl import Workbook
+
+        self.output_path = Path(output_path)
+        self.workbook = Workbook(write_only=True)
+
+        # The Main sheet has to be the first sheet, but its column widths are only known at the end
+        self.main_sheet = self.workbook.create_sheet("Main")
+        self.main_rows = []
+        self.main_widths = [len(title) for title in MAIN_TITLES]
+        self.saved = False
+
+    def add_inventory(self, inventory_number: str, documents: Mapping[str, Mapping[str, Sequence]]) -> None:
+        """
+        Write the sheet of an inventory number and add it to the Main sheet
+
+        Args:
+            inventory_number (str): inventory number, used as the sheet name
+            documents (Mapping[str, Mapping[str, Sequence]]): documents with the page "numbers"
+        """
+        from openpyxl.cell import WriteOnlyCell
+
+        spinque_link = f"{SPINQUE_DOSSIER_URL}/{inventory_number}"
+        self.main_rows.append((inventory_number, len(documents)))
+        self.main_widths[0] = max(self.main_widths[0], len(str(inventory_number)))
+        self.main_widths[1] = max(self.main_widths[1], len(str(spinque_link)))
+        self.main_widths[2] = max(self.main_widths[2], len(str(len(documents))))
+
+        # Column widths have to be set before the first row is written, so compute them in a first pass
+        length_a, length_b, length_c, length_d = (len(title) for title in INVENTORY_TITLES)
+        for document_name, document in documents.items():
+            numbers = document["numbers"]
+            length_a = max(length_a, len(f"{spinque_link}/{numbers[0]}"))
+            length_b = max(length_b, len(document_name))
+            length_c = max(length_c, len(str(len(numbers))))
+            length_d = min(100, max(length_d, sum(len(str(number)) for number in numbers) + len(numbers) - 1))
+
+        inventory_sheet = self.workbook.create_sheet(inventory_number)
+        inventory_sheet.column_dimensions["A"].width = length_a
+        inventory_sheet.column_dimensions["B"].width = length_b
+        inventory_sheet.column_dimensions["C"].width = length_c
+        inventory_sheet.column_dimensions["D"].width = length_d
+
+        inventory_sheet.append(INVENTORY_TITLES)
+        for document_name, document in documents.items():
+            document_link = f"{spinque_link}/{document['numbers'][0]}"
+            link_cell = WriteOnlyCell(inventory_sheet, value=document_link)
+            link_cell.hyperlink = document_link
+            page_numbers = ",".join(map(str, document["numbers"]))
+            inventory_sheet.append((link_cell, document_name, len(document["numbers"]), page_numbers))
+
+        # Flush the sheet to its temporary file, so nothing of this inventory number stays in memory
+        inventory_sheet.close()
+
+    def save(self) -> None:
+        """
+        Write the Main sheet and save the workbook
+        """
+        from openpyxl.cell import WriteOnlyCell
+
+        self.main_sheet.column_dimensions["A"].width = self.main_widths[0]
+        self.main_sheet.column_dimensions["B"].width = self.main_widths[1]
+        self.main_sheet.column_dimensions["C"].width = self.main_widths[2]
+
+        self.main_sheet.append(MAIN_TITLES)
+        for inventory_number, number_of_documents in self.main_rows:
+            inventory_cell = WriteOnlyCell(self.main_sheet, value=inventory_number)
+            inventory_cell.hyperlink = f"#'{inventory_number}'!A1"
+            spinque_link = f"{SPINQUE_DOSSIER_URL}/{inventory_number}"
+            link_cell = WriteOnlyCell(self.main_sheet, value=spinque_link)
+            link_cell.hyperlink = spinque_link
+            self.main_sheet.append((inventory_cell, link_cell, number_of_documents))
+
+        # Save next to the output and move it into place, so a failed save does not leave a partial xlsx file
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = get_temporary_path(self.output_path)
+        try:
+            self.workbook.save(temporary_path)
+            os.replace(temporary_path, self.output_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        self.saved = True
+
+    def abort(self) -> None:
+        """
+        Drop the workbook if it was not saved and remove the temporary files of its sheets, no xlsx file is written
+        """
+        if self.saved:
+            return
+        for sheet in self.workbook.worksheets:
+            writer = getattr(sheet, "_writer", None)
+            if writer is None:
+                continue
+            writer.close()
+            # The temporary file is already removed if the sheet was written by a failed save
+            if os.path.exists(writer.out):
+                writer.cleanup()
+        self.workbook = None
+
+    def __enter__(self) -> "XLSXSeparationWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.abort()
+
+
+def read_document_starts_xlsx(input_path: str | Path) -> Iterator[tuple[str, list[int]]]:
+    """
+    Read the first page number of every document from the inventory sheets of a (corrected) separation xlsx file
+
+    The page numbers are taken from the "Page numbers" column, or from the end of the "Start of document" link if a
+    row has no page numbers. Rows without either are skipped.
+
+    Args:
+        input_path (str | Path): path to the xlsx file
+
+    Raises:
+        ValueError: an inventory sheet does not have the expected columns
+
+    Yields:
+        Iterator[tuple[str, list[int]]]: inventory number and the first page number of each of its documents
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(input_path, read_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            if sheet.title == "Main":
+                continue
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None or not {INVENTORY_TITLES[0], INVENTORY_TITLES[3]}.issubset(header):
+                raise ValueError(f"Invalid separation sheet {sheet.title} in {input_path}: columns {header}")
+            start_column = header.index(INVENTORY_TITLES[0])
+            numbers_column = header.index(INVENTORY_TITLES[3])
+
+            document_starts = []
+            for row in rows:
+                page_numbers = row[numbers_column] if numbers_column < len(row) else None
+                start_link = row[start_column] if start_column < len(row) else None
+                if isinstance(page_numbers, (int, float)):
+                    # A single page number edited in a spreadsheet program is stored as a number
+                    document_starts.append(int(page_numbers))
+                elif page_numbers is not None and str(page_numbers).strip():
+                    document_starts.append(int(str(page_numbers).split(",")[0]))
+                elif start_link is not None and str(start_link).strip():
+                    document_starts.append(int(str(start_link).rstrip("/").rsplit("/", 1)[-1]))
+            yield sheet.title, document_starts
+    finally:
+        workbook.close()